@@ -2,9 +2,11 @@
 
 #!/usr/bin/env python3
 import pandas as pd
+import functools
 import json
 import ast
 import re
+from collections import Counter
 
 
 FILTERED_CSV = "education_filtered.csv"  #<------- Add csv name here
@@ -50,22 +52,24 @@ EFFECTS = {
 # Helpers: literal tag counting & presence
 # ---------------------------
 
-def count_start_tags(text: str, start_tag: str) -> int:
+# Single alternation over every effect tag, with one named group per effect.
+# One pass of this automaton over the text yields all counts at once instead
+# of six independent scans.
+TAG_RE = re.compile(
+    "|".join(
+        f"(?P<{key}>{re.escape(eff['tag'] if 'tag' in eff else eff['start_tag'])})"
+        for key, eff in EFFECTS.items()
+    )
+)
+
+def count_all_tags(text: str) -> Counter:
     """
-    Count literal occurrences of the start tag (ignores end tags entirely).
-    Uses re.escape to avoid regex semantics.
+    Count occurrences of every effect tag in one scan.
+    Returns a Counter keyed by effect name (missing keys read as 0).
     """
     if not isinstance(text, str) or not text:
-        return 0
-    return len(re.findall(re.escape(start_tag), text))
-
-def tag_present_literal(text: str, tag: str) -> bool:
-    """
-    True if the literal tag appears at least once in text.
-    """
-    if not isinstance(text, str) or not text:
-        return False
-    return bool(re.search(re.escape(tag), text))
+        return Counter()
+    return Counter(m.lastgroup for m in TAG_RE.finditer(text))
 
 def truthy(val) -> bool:
     """
@@ -86,27 +90,36 @@ def truthy(val) -> bool:
 #  - Falls back to ast.literal_eval for non-JSON string-likes
 # ---------------------------
 
-def extract_full_text(segments_str: str) -> str:
+@functools.lru_cache(maxsize=None)
+def _parse_segments_str(raw: str):
     """
-    Combines transcript + visualDescription into one searchable string.
-    Returns "" if parsing fails.
+    Parse a raw segments cell: JSON first, Python literal syntax second.
+    Single-quoted blobs are handled by ast.literal_eval rather than the
+    old .replace("'", '"') quote fix, which corrupted apostrophes inside
+    values. Memoized so repeated lookups of the same blob parse once.
+    Returns None if parsing fails.
     """
-    if not isinstance(segments_str, str) or not segments_str.strip():
-        return ""
-
-    # Normalize some quote irregularities early
-    raw = segments_str.strip()
-
-    parsed = None
-    # Try JSON first (with a gentle quote fix)
     try:
-        fixed = raw.replace("'", '"')
-        parsed = json.loads(fixed)
+        return json.loads(raw)
     except Exception:
-        # Try literal_eval next
         try:
-            parsed = ast.literal_eval(raw)
+            return ast.literal_eval(raw)
         except Exception:
+            return None
+
+def extract_full_text(segments) -> str:
+    """
+    Combines transcript + visualDescription into one searchable string.
+    Accepts an already-parsed list/dict as well as the raw string cell.
+    Returns "" if parsing fails.
+    """
+    if isinstance(segments, (list, dict)):
+        parsed = segments
+    else:
+        if not isinstance(segments, str) or not segments.strip():
+            return ""
+        parsed = _parse_segments_str(segments.strip())
+        if parsed is None:
             return ""
 
     # If it's a dict with "segments", use that list
@@ -117,70 +130,95 @@ def extract_full_text(segments_str: str) -> str:
     if not isinstance(parsed, list):
         return ""
 
-    # Build the combined text
-    parts = []
+    # Build the combined text; values are almost always str already, so
+    # only stringify the odd one out
+    parts: list[str] = []
     for seg in parsed:
         if isinstance(seg, dict):
             t = seg.get("transcript", "")
             v = seg.get("visualDescription", "")
             if t:
-                parts.append(str(t))
+                parts.append(t if isinstance(t, str) else str(t))
             if v:
-                parts.append(str(v))
+                parts.append(v if isinstance(v, str) else str(v))
     return " ".join(parts).strip()
 
 # ---------------------------
 # Mismatch checker
 # ---------------------------
 
-def check_effect_mismatches(df: pd.DataFrame) -> list:
-    mismatches = []
-
-    for idx, row in df.iterrows():
-        vid = row.get("video_id", f"row_{idx}")
-        text = extract_full_text(row.get("edited script", ""))
-
-        # DEBUG (optional): Uncomment to verify extraction and counts
-        # print(f"[DEBUG] {vid} text length={len(text)}")
-        # print(f"[DEBUG] {vid} [S_ANIMATED] count={count_start_tags(text, EFFECTS['animated']['start_tag'])}")
-
-        row_mismatches = {"video_id": vid}
-
-        for eff_key, eff in EFFECTS.items():
-            # Count-based predictions: compare predicted count vs start tag occurrences
-            if "pred_count_col" in eff:
-                predicted_raw = row.get(eff["pred_count_col"], 0)
-                predicted = int(predicted_raw) if pd.notna(predicted_raw) and str(predicted_raw).strip() != "" else 0
-                placed = count_start_tags(text, eff["start_tag"])
-                if placed != predicted:
-                    row_mismatches[eff_key] = (predicted, placed)
-
-            # Boolean predictions: compare predicted bool vs presence of tag(s)
-            elif "pred_bool_col" in eff:
-                predicted = truthy(row.get(eff["pred_bool_col"], False))
-
-                # Single-tag style (e.g., [TRANSITION])
-                if "tag" in eff:
-                    placed_bool = tag_present_literal(text, eff["tag"])
-                else:
-                    # Start/end style → presence determined solely by start tag
-                    placed_bool = count_start_tags(text, eff["start_tag"]) > 0
-
-                if placed_bool != predicted:
-                    row_mismatches[eff_key] = (predicted, placed_bool)
-
-        if len(row_mismatches) > 1:  # any mismatches beyond the video_id field
-            mismatches.append(row_mismatches)
-
-    return mismatches
+def check_effect_mismatches(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a long-form DataFrame with one row per (video, effect)
+    mismatch — columns: video_id, effect, predicted, placed. Results stay
+    column-oriented (one array per field) instead of one dict per row.
+    """
+    # Extract the combined text once per row, then scan each text a single
+    # time with the combined alternation to get every tag count at once.
+    if "edited script" in df.columns:
+        text_series = df["edited script"].map(extract_full_text)
+    else:
+        text_series = pd.Series("", index=df.index)
+    tag_counts = text_series.map(count_all_tags)
+
+    if "video_id" in df.columns:
+        vids = df["video_id"]
+    else:
+        vids = pd.Series([f"row_{idx}" for idx in df.index], index=df.index)
+
+    frames = []
+    for eff_key, eff in EFFECTS.items():
+        # Count-based predictions: compare predicted count vs start tag occurrences
+        if "pred_count_col" in eff:
+            col = eff["pred_count_col"]
+            if col in df.columns:
+                predicted = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
+            else:
+                predicted = pd.Series(0, index=df.index)
+            placed = tag_counts.map(lambda counts, key=eff_key: counts[key])
+
+        # Boolean predictions: compare predicted bool vs presence of tag(s).
+        # Single-tag style (e.g., [TRANSITION]) and start/end style alike:
+        # presence is determined solely by the start/single tag count.
+        else:
+            col = eff["pred_bool_col"]
+            if col in df.columns:
+                predicted = df[col].map(truthy)
+            else:
+                predicted = pd.Series(False, index=df.index)
+            placed = tag_counts.map(lambda counts, key=eff_key: counts[key] > 0)
+
+        mask = placed.ne(predicted)
+        if mask.any():
+            frames.append(pd.DataFrame({
+                "video_id": vids[mask],
+                "effect": eff_key,
+                "predicted": predicted[mask],
+                "placed": placed[mask],
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=["video_id", "effect", "predicted", "placed"])
+    return pd.concat(frames, ignore_index=True)
 
 # ---------------------------
 # Run
 # ---------------------------
 
+# Only these columns are needed for the mismatch check; skipping the rest
+# cuts parse time and memory on the wide Gemini-output CSVs.
+NEEDED_COLS = {"video_id", "edited script"} | {
+    eff[key]
+    for eff in EFFECTS.values()
+    for key in ("pred_count_col", "pred_bool_col")
+    if key in eff
+}
+
 if __name__ == "__main__":
-    df = pd.read_csv(FILTERED_CSV)
+    df = pd.read_csv(FILTERED_CSV, usecols=lambda col: col in NEEDED_COLS)
     results = check_effect_mismatches(df)
 
-    for r in results:
-        print(r)
+    if results.empty:
+        print("No mismatches found.")
+    else:
+        print(results.to_string(index=False))
@@ -1,10 +1,13 @@
 # This file just includes downloads the videos from the txt file filters only english videos based on descriptions and length and saves them to raw csv
 
 import os
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
 import pandas as pd
 import pyktok as pyk
-from langdetect import detect
+from langdetect import DetectorFactory, detect
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -15,6 +18,7 @@ load_dotenv()
 MAX_DURATION = 120
 MINIMUM_VIEWS = 100000 #The video should have atleast 100,000 to consider viral
 LANGUAGE = "en"
+MAX_DOWNLOAD_WORKERS = 8  # download is network-bound, so threads overlap the waits
 
 GENRE = os.environ.get("VIDEO_CATEGORY").strip()
 VIDEO_DATA_DIR = "video_data"
@@ -39,35 +43,49 @@ if not os.path.isfile(VIDEO_IDS_FILE):
     raise FileNotFoundError(f"Could not find IDs file at: {VIDEO_IDS_FILE}")
 
 with open(VIDEO_IDS_FILE, "r", encoding="utf-8") as f:
-    seen = set()
-    video_ids = []
-    for line in f:
-        vid = line.strip()
-        if vid and vid not in seen:
-            seen.add(vid)
-            video_ids.append(vid)
+    # dict.fromkeys dedupes in one C-level pass while preserving order
+    video_ids = list(dict.fromkeys(line.strip() for line in f if line.strip()))
 
 if not video_ids:
     raise ValueError(f"No video IDs found in {VIDEO_IDS_FILE}")
 
 # --------------------------
-# Step 1: Download videos & metadata (one by one with try/except)
+# Step 1: Download videos & metadata (concurrently, with try/except per ID)
 # --------------------------
 successful_ids = []
-for vid in video_ids:
+successful_lock = threading.Lock()
+
+def download_one(vid):
     url = f"https://www.tiktok.com/@tiktok/video/{vid}"
+    # Each worker appends metadata to its own part CSV; pyktok's
+    # read-modify-write append is not safe to share across threads.
+    part_csv = f"{RAW_CSV_PATH}.part{threading.get_ident()}"
     try:
         pyk.save_tiktok_multi_urls(
             [url],
             True,   # download videos too
-            RAW_CSV_PATH,
+            part_csv,
             1
         )
-        successful_ids.append(vid)
+        with successful_lock:
+            successful_ids.append(vid)
         print(f"Downloaded {vid}")
     except Exception as e:
         print(f"❌ Failed to download {vid}: {e}")
 
+with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
+    list(executor.map(download_one, video_ids))
+
+# Merge the per-worker part CSVs into the single raw CSV
+part_paths = sorted(glob(f"{RAW_CSV_PATH}.part*"))
+if part_paths:
+    frames = [pd.read_csv(p) for p in part_paths]
+    if os.path.exists(RAW_CSV_PATH):
+        frames.insert(0, pd.read_csv(RAW_CSV_PATH))
+    pd.concat(frames, ignore_index=True).to_csv(RAW_CSV_PATH, index=False)
+    for p in part_paths:
+        os.remove(p)
+
 print(f"Processed {len(successful_ids)} successful downloads. Data saved to {RAW_CSV_PATH}.")
 
 # --------------------------
@@ -79,14 +97,24 @@ if not os.path.exists(RAW_CSV_PATH):
 
 df = pd.read_csv(RAW_CSV_PATH)
 
+DetectorFactory.seed = 0  # langdetect is stochastic unless seeded
+
 def is_english(text):
     try:
         return detect(str(text)) == LANGUAGE
     except Exception:
         return False
 
+# Cheap vectorized pre-filter: descriptions that are mostly non-ASCII are
+# almost never English, so langdetect only runs on the remaining rows.
+desc = df["video_description"].astype(str)
+ascii_ratio = desc.str.encode("ascii", "ignore").str.len() / desc.str.len().clip(lower=1)
+maybe_english = ascii_ratio >= 0.5
+english_mask = maybe_english.copy()
+english_mask[maybe_english] = desc[maybe_english].map(is_english)
+
 df_filtered = df[
-    df["video_description"].apply(is_english)
+    english_mask
     & (df["video_duration"] <= MAX_DURATION)
     & (df["video_playcount"] >= MINIMUM_VIEWS)
 ]
@@ -98,18 +126,21 @@ df_filtered.to_csv(FILTERED_CSV_PATH, index=False)
 os.makedirs(KEEP_DIR, exist_ok=True)
 
 video_ids_to_keep = set(str(vid) for vid in df_filtered["video_id"].astype(str))
-kept_count = 0
-deleted_count = 0
-
-for fname in os.listdir("."):
-    if fname.endswith(".mp4"):
-        vid = fname.split("_")[-1].replace(".mp4", "")
-        if vid in video_ids_to_keep:
-            shutil.move(fname, os.path.join(KEEP_DIR, fname))
-            kept_count += 1
-        else:
-            os.remove(fname)
-            deleted_count += 1
+
+# One pattern-matched sweep instead of filtering the whole cwd listing
+mp4s = glob("*.mp4")
+to_keep = [f for f in mp4s if f.split("_")[-1].replace(".mp4", "") in video_ids_to_keep]
+kept = set(to_keep)
+to_drop = [f for f in mp4s if f not in kept]
+
+for fname in to_keep:
+    # os.replace is an atomic rename on the same filesystem (no copy)
+    os.replace(fname, os.path.join(KEEP_DIR, fname))
+for fname in to_drop:
+    os.remove(fname)
+
+kept_count = len(to_keep)
+deleted_count = len(to_drop)
 
 print(f"Moved {kept_count} videos to '{KEEP_DIR}', deleted {deleted_count} others.")
 print(f"Filtered metadata saved to {FILTERED_CSV_PATH}.")
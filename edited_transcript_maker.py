@@ -1,3 +1,4 @@
+import asyncio
 import os
 import time
 import json
@@ -22,6 +23,7 @@ if not GEMINI_API_KEY:
 FILTERED_CSV = Path("filtered") / f"{GENRE}_filtered.csv"
 KEEP_DIR = Path(f"kept_{GENRE}_videos")
 NEW_JSON_COL = "edited_script"  # new column to store Gemini JSON
+GEMINI_CONCURRENCY = 4  # bounded in-flight Gemini jobs
 
 # Gemini client
 client = genai.Client(api_key=GEMINI_API_KEY)
@@ -34,47 +36,128 @@ client = genai.Client(api_key=GEMINI_API_KEY)
 def extract_video_id(filename: str) -> str:
     return filename.split("_")[-1].replace(".mp4", "")
 
-def get_segment_for_video(df: pd.DataFrame, video_id: str) -> Optional[str]:
-    mask = df["video_id"].astype(str) == str(video_id)
-    if mask.any():
-        seg = df.loc[mask, "segments"].values[0]
-        return None if (pd.isna(seg) or seg is None) else str(seg)
-    return None
+def build_video_id_index(df: pd.DataFrame) -> dict:
+    """video_id -> row label, for O(1) point lookups instead of column scans.
+    Assumes df["video_id"] has been normalized to str once at load time."""
+    return dict(zip(df["video_id"], df.index))
+
+def get_segment_for_video(df: pd.DataFrame, video_id: str, id_index: Optional[dict] = None) -> Optional[str]:
+    if id_index is None:
+        id_index = build_video_id_index(df)
+    idx = id_index.get(str(video_id))
+    if idx is None:
+        return None
+    seg = df.at[idx, "segments"]
+    return None if (pd.isna(seg) or seg is None) else str(seg)
+
+NO_EFFECTS_INSTRUCTION = "There are no editing effects to place."
+
+# Static prompt text lives at module level; per-call work is one .format
+PROMPT_TEMPLATE = (
+    "You are a professional video effect placer.\n"
+    "You will be provided with a visual description and a script of a video.\n"
+    "Your task is to place the video effects that exists in the video in appropriate places within the script.\n"
+    "The script can either be the transcript or a dense caption containing actions and objects.\n"
+    "Do not invent effects. Only place markers for effects that are explicitly listed.\n\n"
+    "{effect_instructions}\n\n"
+    "Keep the original script and visual descriptions unmodified. Only insert markers as needed.\n"
+    "Only insert the effects in the script, do not insert the markers in the visual description\n"
+    "The effects should only be placed in one script and should not be inserted in multiple scripts.\n"
+    "[SEGMENT]\n{segment_block}\n[/SEGMENT]"
+)
+
+_EFFECT_COUNT_COLS = [
+    "b_roll_count",
+    "animated_graphics_count",
+    "transition_count",
+    "sound_effects_count",
+]
+_EFFECT_BOOL_COLS = ["background_music_present", "on_screen_text_present"]
+
+def _parse_tos_list(val) -> list:
+    """Parse a type_of_on_screen_text cell into a list (once, at load)."""
+    if isinstance(val, list):
+        return val
+    if pd.isna(val):
+        return []
+    s = str(val)
+    try:
+        parsed = json.loads(s.replace("'", '"'))
+        return parsed if isinstance(parsed, list) else [parsed]
+    except Exception:
+        return [s]
+
+def _normalize_effect_columns(df: pd.DataFrame) -> dict:
+    """
+    Pre-cast the fields build_effect_instruction needs, column-wise.
+    Kept out of df itself so the CSV round-trips byte-for-byte at save.
+    """
+    norm = {}
+    for col in _EFFECT_COUNT_COLS:
+        if col in df.columns:
+            norm[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int32")
+        else:
+            norm[col] = pd.Series(0, index=df.index, dtype="int32")
+    for col in _EFFECT_BOOL_COLS:
+        if col in df.columns:
+            norm[col] = df[col].astype(str).str.strip().str.upper().eq("TRUE")
+        else:
+            norm[col] = pd.Series(False, index=df.index)
+    if "type_of_on_screen_text" in df.columns:
+        norm["type_of_on_screen_text"] = df["type_of_on_screen_text"].map(_parse_tos_list)
+    else:
+        norm["type_of_on_screen_text"] = pd.Series([[] for _ in df.index], index=df.index)
+
+    # Rows with no effects at all short-circuit the prompt build entirely
+    has_any = pd.Series(False, index=df.index)
+    for col in _EFFECT_COUNT_COLS:
+        has_any |= norm[col].gt(0)
+    for col in _EFFECT_BOOL_COLS:
+        has_any |= norm[col]
+    norm["_has_any_effect"] = has_any
+    return norm
+
+def _effect_row(norm: dict, idx) -> dict:
+    """Typed per-row view of the normalized effect columns."""
+    row = {col: int(norm[col].at[idx]) for col in _EFFECT_COUNT_COLS}
+    for col in _EFFECT_BOOL_COLS:
+        row[col] = bool(norm[col].at[idx])
+    row["type_of_on_screen_text"] = norm["type_of_on_screen_text"].at[idx]
+    row["_has_any_effect"] = bool(norm["_has_any_effect"].at[idx])
+    return row
 
 def build_effect_instruction(row: dict) -> str:
+    # Expects pre-normalized fields: counts as ints, presence flags as
+    # bools, type_of_on_screen_text as a list (see _normalize_effect_columns)
+    if not row.get("_has_any_effect", True):
+        return NO_EFFECTS_INSTRUCTION
+
     effects = []
 
-    b_roll_count = int(row.get("b_roll_count", 0))
+    b_roll_count = row.get("b_roll_count", 0)
     if b_roll_count > 0:
         effects.append(f"- Insert exactly {b_roll_count} B-roll spans using [BROLL] to mark start and [/BROLL] to mark the end. You are not required to provide information about the type of B-roll between the spans.")
 
-    animated_count = int(row.get("animated_graphics_count", 0))
+    animated_count = row.get("animated_graphics_count", 0)
     if animated_count > 0:
         effects.append(f"- Insert exactly {animated_count} animated graphics spans using [ANIMATED] to mark start and [/ANIMATED] to mark the end. You are not required to provide information about the type of animated graphic between the spans.")
 
-    transition_count = int(row.get("transition_count", 0))
+    transition_count = row.get("transition_count", 0)
     if transition_count > 0:
         effects.append(f"- Insert exactly {transition_count } [TRANSITION] markers at start of the script where the transition is present.")
 
-    sound_count = int(row.get("sound_effects_count", 0))
+    sound_count = row.get("sound_effects_count", 0)
     if sound_count > 0:
         effects.append(f"- Insert exactly {sound_count} [SOUND_EFFECT] ... [/SOUND_EFFECT] spans for sound effects where they are present. You are not required to provide information about the type of sound effect between the spans.")
 
-    if str(row.get("background_music_present", "")).strip().upper() == "TRUE":
+    if row.get("background_music_present", False):
         effects.append("- Background music is present. Insert [BACKGROUND_MUSIC] at the start of the first script.")
 
-    tos_present = str(row.get("on_screen_text_present", "")).strip().upper() == "TRUE"
-    tos_types = row.get("type_of_on_screen_text", [])
-    if tos_present:
-        if isinstance(tos_types, str):
-            try:
-                tos_types = json.loads(tos_types.replace("'", '"'))
-            except:
-                tos_types = [tos_types]
+    if row.get("on_screen_text_present", False):
         effects.append("- Insert [TOS] to marks start and [/TOS] to mark end for meaningful on-screen text overlays (not account handles). You are not required to provide information about the content of the text on screen between the spans.")
 
     if not effects:
-        return "There are no editing effects to place."
+        return NO_EFFECTS_INSTRUCTION
 
     return (
         "Please place the following editing effects:\n\n"
@@ -82,37 +165,61 @@ def build_effect_instruction(row: dict) -> str:
         + "\n\nOnly place the effects listed above. Do not add any other effects."
     )
 
+MAX_PROCESSING_WAIT = 600  # seconds before giving up on a stuck upload
+
+def _generate_with_backoff(contents, config):
+    """
+    Call generate_content, backing off only when the API actually reports
+    rate limiting (429 / RESOURCE_EXHAUSTED) instead of sleeping a fixed
+    second after every video.
+    """
+    delay = 1.0
+    while True:
+        try:
+            return client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=contents,
+                config=config,
+            )
+        except Exception as e:
+            msg = str(e)
+            if "429" not in msg and "RESOURCE_EXHAUSTED" not in msg:
+                raise
+            print(f"[Gemini] Rate limited; retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
 def gemini_analysis(video_path: str, segment_text: Optional[str], row: dict) -> dict:
     myfile = client.files.upload(file=video_path)
 
+    # Poll with exponential backoff instead of a fixed 5s sleep: short
+    # videos are picked up quickly, long ones poll less often.
+    delay = 0.5
+    waited = 0.0
     while True:
         current_file = client.files.get(name=myfile.name)
         if current_file.state != "PROCESSING":
             break
+        if waited >= MAX_PROCESSING_WAIT:
+            raise TimeoutError(
+                f"Video still processing after {MAX_PROCESSING_WAIT}s: {video_path}"
+            )
         print("Waiting for video to be processed...")
-        time.sleep(5)
+        time.sleep(delay)
+        waited += delay
+        delay = min(delay * 1.7, 10.0)
 
     print(f"[Gemini] Video processed → {os.path.basename(video_path)}; analyzing...")
 
     segment_block = segment_text or "(no segment text provided)"
     effect_instructions = build_effect_instruction(row)
 
-    prompt = (
-        "You are a professional video effect placer.\n"
-        "You will be provided with a visual description and a script of a video.\n"
-        "Your task is to place the video effects that exists in the video in appropriate places within the script.\n"
-        "The script can either be the transcript or a dense caption containing actions and objects.\n"
-        "Do not invent effects. Only place markers for effects that are explicitly listed.\n\n"
-        f"{effect_instructions}\n\n"
-        "Keep the original script and visual descriptions unmodified. Only insert markers as needed.\n"
-        "Only insert the effects in the script, do not insert the markers in the visual description\n"
-        "The effects should only be placed in one script and should not be inserted in multiple scripts.\n"
-        ""
-        f"[SEGMENT]\n{segment_block}\n[/SEGMENT]"
+    prompt = PROMPT_TEMPLATE.format(
+        effect_instructions=effect_instructions,
+        segment_block=segment_block,
     )
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+    response = _generate_with_backoff(
         contents=[myfile, prompt],
         config={"response_mime_type": "application/json"},
     )
@@ -134,11 +241,62 @@ def gemini_analysis(video_path: str, segment_text: Optional[str], row: dict) ->
     else:
         return {"raw": str(raw)}
 
+async def _analyze_pending(df: pd.DataFrame, pending: list, sidecar) -> None:
+    """
+    Run Gemini analyses for the pending rows with bounded concurrency.
+    The sync client runs in worker threads; the single consumer below is
+    the only writer to the DataFrame and the sidecar, so no locks are
+    needed.
+    """
+    sem = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+    async def run_one(idx, video_id, video_path, segment_text, row_dict):
+        async with sem:
+            print(f"\n=== Processing video_id={video_id} -> {os.path.basename(video_path)} ===")
+            try:
+                result = await asyncio.to_thread(
+                    gemini_analysis, video_path, segment_text, row_dict
+                )
+            except Exception as e:
+                print(f"[Gemini] Error analyzing video_id={video_id}: {e}")
+                result = None
+            return idx, video_id, result
+
+    tasks = [asyncio.create_task(run_one(*item)) for item in pending]
+    for task in asyncio.as_completed(tasks):
+        idx, video_id, result_json = await task
+        if result_json is None:
+            continue
+        # Keep the in-memory frame current and append to the sidecar
+        compact = json.dumps(result_json, ensure_ascii=False, separators=(",", ":"))
+        df.at[idx, NEW_JSON_COL] = compact
+        sidecar.write(
+            json.dumps({"video_id": video_id, NEW_JSON_COL: compact}, ensure_ascii=False) + "\n"
+        )
+
+def _merge_sidecar(df: pd.DataFrame, sidecar_path: str) -> None:
+    """Fold results appended to the JSONL sidecar back into the DataFrame."""
+    if not os.path.exists(sidecar_path):
+        return
+    records = {}
+    with open(sidecar_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                records[str(rec["video_id"])] = rec[NEW_JSON_COL]
+    if records:
+        updates = df["video_id"].map(records)
+        df[NEW_JSON_COL] = updates.where(updates.notna(), df[NEW_JSON_COL])
+
 def analyze_and_save_with_segments(keep_dir: str, csv_path: str) -> None:
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"CSV not found: {csv_path}")
 
-    df = pd.read_csv(csv_path)
+    # PyArrow's multithreaded parser loads the wide filtered CSV much
+    # faster than the default engine. All columns are kept because the
+    # frame is re-serialized in full at the end.
+    df = pd.read_csv(csv_path, engine="pyarrow")
 
     if "video_id" not in df.columns:
         raise ValueError("CSV must contain a 'video_id' column.")
@@ -147,43 +305,56 @@ def analyze_and_save_with_segments(keep_dir: str, csv_path: str) -> None:
     if NEW_JSON_COL not in df.columns:
         df[NEW_JSON_COL] = pd.NA
 
-    for idx, row in df.iterrows():
-        video_id = str(row["video_id"]).strip()
-
-        # Skip already processed rows
-        if not pd.isna(row.get(NEW_JSON_COL, None)):
-            print(f"Skipping video_id={video_id}: already analyzed.")
-            continue
-
-        # Find matching video file: "@tiktok_video_<id>.mp4"
-        matched_file = None
-        for fname in os.listdir(keep_dir):
-            if fname.endswith(f"{video_id}.mp4"):
-                matched_file = fname
-                break
+    # Normalize the ID column once instead of per-row astype calls
+    df["video_id"] = df["video_id"].astype(str)
+
+    # Results are appended to a JSONL sidecar (O(1) per video) and merged
+    # into the CSV once at the end, instead of rewriting the whole CSV
+    # after every Gemini call. Replay any sidecar from an interrupted run
+    # first so those rows are not re-analyzed.
+    sidecar_path = f"edited_{GENRE}.jsonl"
+    _merge_sidecar(df, sidecar_path)
+
+    # Index the kept videos once: "@tiktok_video_<id>.mp4" -> filename.
+    # Avoids rescanning the directory for every CSV row.
+    file_index = {
+        extract_video_id(fname): fname
+        for fname in os.listdir(keep_dir)
+        if fname.lower().endswith(".mp4")
+    }
+
+    # Normalize effect fields column-wise so build_effect_instruction does
+    # no per-call parsing
+    norm = _normalize_effect_columns(df)
+
+    # Collect the rows that still need analysis, then fan them out.
+    # A single vectorized isna() mask replaces the per-row "already
+    # analyzed" check, and file lookups go through the prebuilt index.
+    pending = []
+    for idx in df.index[df[NEW_JSON_COL].isna()]:
+        video_id = df.at[idx, "video_id"].strip()
+        matched_file = file_index.get(video_id)
 
         if matched_file is None:
             print(f"⚠ No video found for video_id={video_id}. Skipping.")
             continue
 
         video_path = os.path.join(keep_dir, matched_file)
-        segment_text = row["segments"]
-
-        print(f"\n=== Processing video_id={video_id} -> {matched_file} ===")
-
-        try:
-            result_json = gemini_analysis(video_path, segment_text, row.to_dict())
-        except Exception as e:
-            print(f"[Gemini] Error analyzing video_id={video_id}: {e}")
-            continue
-
-        # Save result into CSV row
-        df.at[idx, NEW_JSON_COL] = json.dumps(
-            result_json, ensure_ascii=False, separators=(",", ":")
+        pending.append(
+            (idx, video_id, video_path, df.at[idx, "segments"], _effect_row(norm, idx))
         )
 
-        df.to_csv(csv_path, index=False)  # Save after each processed video
-        time.sleep(1)
+    sidecar = open(sidecar_path, "a", encoding="utf-8", buffering=1 << 20)
+    try:
+        if pending:
+            asyncio.run(_analyze_pending(df, pending, sidecar))
+    finally:
+        # Single full CSV write, even if the loop was interrupted
+        sidecar.close()
+        df.to_csv(csv_path, index=False)
+
+    if os.path.exists(sidecar_path):
+        os.remove(sidecar_path)
 
     print(f"\nDone. Updated CSV saved to {csv_path}")
 
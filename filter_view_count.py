@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -28,21 +31,8 @@ os.makedirs(KEEP_DIR, exist_ok=True)
 # --------------------------
 ID_COL, VIEWS_COL = "video_id", "video_playcount"
 
-def extract_video_id(fname: str) -> str | None:
-    """
-    Infer the TikTok video ID from filenames like:
-      anything_<id>.mp4, anything-<id>.mp4, or <id>.mp4
-    """
-    if not fname.lower().endswith(".mp4"):
-        return None
-    base = os.path.basename(fname)
-    for sep in ("_", "-"):
-        if sep in base:
-            cand = base.rsplit(sep, 1)[-1].removesuffix(".mp4")
-            if cand.isdigit():
-                return cand
-    m = re.search(r"(\d+)(?=\.mp4$)", base)
-    return m.group(1) if m else None
+# Matches anything_<id>.mp4, anything-<id>.mp4, or <id>.mp4 — compiled once
+_VIDEO_ID_RE = re.compile(r"(?:^|[_-])(\d+)\.mp4$", re.IGNORECASE)
 
 # --------------------------
 # Prune by view count
@@ -56,28 +46,50 @@ if ID_COL not in df.columns or VIEWS_COL not in df.columns:
 
 # Normalize
 df[ID_COL] = df[ID_COL].astype(str)
-df[VIEWS_COL] = pd.to_numeric(df[VIEWS_COL], errors="coerce")
 
-# Determine which to drop
-low_mask = df[VIEWS_COL] < MINIMUM_VIEWS
-low_ids = set(df.loc[low_mask, ID_COL].astype(str))
+# Determine which to drop, as one boolean numpy array. The coerced
+# numbers only feed this mask — the column itself is left untouched so
+# the pruned CSV round-trips the original view-count strings verbatim.
+# Policy: a row whose view count failed to parse (NaN) is DROPPED — we
+# can't verify it meets the minimum. (Plain `views < MINIMUM_VIEWS`
+# would silently keep NaN rows, since NaN comparisons are False.)
+views = pd.to_numeric(df[VIEWS_COL], errors="coerce").to_numpy()
+low_mask = np.where(np.isnan(views), True, views < MINIMUM_VIEWS)
+
+# ID_COL is already str-normalized above, so pull the raw numpy array
+# and mask it without another conversion pass
+low_ids = set(df[ID_COL].to_numpy()[low_mask])
 
 print(f"[{GENRE}] Loaded {len(df)} rows from {FILTERED_CSV_PATH}")
 print(f"Minimum views: {MINIMUM_VIEWS:,}")
 print(f"Below-threshold rows: {low_mask.sum()}")
 
 # Delete files from kept_{GENRE}_videos
+# os.scandir hands back DirEntry objects (name + cached file type) without
+# a separate stat/join per entry
+to_delete = []
+with os.scandir(KEEP_DIR) as it:
+    for de in it:
+        if not de.is_file():
+            continue
+        m = _VIDEO_ID_RE.search(de.name)
+        if m and m.group(1) in low_ids:
+            to_delete.append(de.path)
+
+# unlink is a round-trip syscall each time (worst on network filesystems),
+# so run the batch through a thread pool instead of sequentially
+def _safe_unlink(path: str) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except Exception as e:
+        print(f"Could not delete {path}: {e}")
+        return False
+
 deleted = 0
-for entry in os.listdir(KEEP_DIR):
-    if not entry.lower().endswith(".mp4"):
-        continue
-    vid = extract_video_id(entry)
-    if vid and vid in low_ids:
-        try:
-            os.remove(os.path.join(KEEP_DIR, entry))
-            deleted += 1
-        except Exception as e:
-            print(f"Could not delete {entry}: {e}")
+if to_delete:
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        deleted = sum(ex.map(_safe_unlink, to_delete))
 
 print(f"Deleted {deleted} video file(s) from {KEEP_DIR}")
 
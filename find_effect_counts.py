@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -31,12 +33,35 @@ EFFECT_COLS = [
 
 VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm"}
 
-def to_bool(x):
-    if isinstance(x, bool):
-        return x
-    if pd.isna(x):
+# Filenames look like anything_<id>, anything-<id>, or <id> (extension
+# already stripped) — same naming scheme filter_view_count.py matches on
+_VIDEO_ID_RE = re.compile(r"(?:^|[_-])(\d+)$")
+
+_TRUE_SET = frozenset({"true", "1", "yes", "y", "t"})
+
+def _iter_videos(root):
+    """
+    Yield DirEntry objects for video files under root, recursively.
+    os.scandir caches file-type info from the directory read itself,
+    so unlike Path.rglob there is no extra stat per entry.
+    """
+    with os.scandir(root) as it:
+        for de in it:
+            if de.is_dir(follow_symlinks=False):
+                yield from _iter_videos(de.path)
+            elif de.is_file(follow_symlinks=False):
+                name = de.name
+                dot = name.rfind(".")
+                if dot != -1 and name[dot:].lower() in VIDEO_EXTS:
+                    yield de
+
+def _safe_unlink(path) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except Exception as e:
+        print(f"Could not delete {path}: {e}")
         return False
-    return str(x).strip().lower() in {"true", "1", "yes", "y", "t"}
 
 def main():
     if not CSV_PATH.exists():
@@ -61,9 +86,11 @@ def main():
         print("ERROR: 'video_id' column is required in the CSV.")
         sys.exit(1)
 
-    # Normalize boolean-ish columns
+    # Normalize boolean-ish columns — one vectorized pass per column
+    # instead of a Python call per cell (NaN stringifies to "nan",
+    # which isn't in the set, so missing values come out False)
     for col in EFFECT_COLS:
-        df[col] = df[col].apply(to_bool)
+        df[col] = df[col].astype(str).str.strip().str.lower().isin(_TRUE_SET)
 
     # Keep rows where at least one effect is present
     mask_any_effect = df[EFFECT_COLS].any(axis=1)
@@ -82,21 +109,26 @@ def main():
         print(f"NOTE: Video directory not found at {VIDEO_DIR.resolve()} — skipping file deletions.")
         return
 
-    deleted_files = 0
+    to_delete = []
     kept_files = 0
 
-    for p in VIDEO_DIR.rglob("*"):
-        if p.is_file() and p.suffix.lower() in VIDEO_EXTS:
-            name_no_ext = p.stem
-            # delete if filename contains any removed video_id
-            if any(vid and vid in name_no_ext for vid in removed_ids):
-                try:
-                    p.unlink()
-                    deleted_files += 1
-                except Exception as e:
-                    print(f"Could not delete {p}: {e}")
-            else:
-                kept_files += 1
+    for de in _iter_videos(VIDEO_DIR):
+        # delete if the filename's trailing video_id was removed —
+        # extract the id and do one set lookup instead of scanning
+        # every removed id against every filename
+        stem = de.name.rsplit(".", 1)[0]
+        m = _VIDEO_ID_RE.search(stem)
+        if m and m.group(1) in removed_ids:
+            to_delete.append(de.path)
+        else:
+            kept_files += 1
+
+    # Batch the unlinks through a thread pool — each unlink is a syscall
+    # round-trip and sequential deletion crawls on network filesystems
+    deleted_files = 0
+    if to_delete:
+        with ThreadPoolExecutor(max_workers=16) as ex:
+            deleted_files = sum(ex.map(_safe_unlink, to_delete))
 
     print(f"Video cleanup complete: deleted {deleted_files} files, kept {kept_files} files.")
     print("Done.")
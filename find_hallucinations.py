@@ -4,7 +4,6 @@
 
 #!/usr/bin/env python3
 import os
-import ast
 from pathlib import Path
 
 import pandas as pd
@@ -20,101 +19,98 @@ OUTPUT_CSV = ANOMALIES_DIR / f"{GENRE}_anomalies.csv"
 
 ANOMALIES_DIR.mkdir(parents=True, exist_ok=True)
 
-def to_bool(x):
-    if isinstance(x, bool):
-        return x
-    if pd.isna(x):
-        return False
-    s = str(x).strip().lower()
-    return s in {"true", "1", "yes", "y", "t"}
-
-def to_int(x, default=0):
-    try:
-        if pd.isna(x):
-            return default
-        return int(float(x))
-    except Exception:
-        return default
-
-def parse_list_like(x):
+OVERUSE_THRESHOLD = 5
+OVERUSE_COUNT_COLS = [
+    "b_roll_count",
+    "animated_graphics_count",
+    "transitions_count",
+    "sound_effects_count",
+]
+
+_TRUE_SET = frozenset({"true", "1", "yes", "y", "t"})
+
+# Only these columns feed the anomaly rules; the Gemini-output CSVs are
+# 30+ columns wide, so skipping the rest cuts parse time and memory.
+NEEDED_COLS = frozenset({
+    "video_id",
+    "background_music_present",
+    "sound_effects_present",
+    "type_of_on_screen_text",
+    *OVERUSE_COUNT_COLS,
+})
+
+def find_anomalies(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Accepts lists, JSON/Python-like lists in strings, or comma-separated strings.
-    Returns a list of stripped strings.
+    Vectorized anomaly rules: every rule is computed as a boolean Series
+    over the whole frame instead of once per row. The human-readable
+    reason strings are only assembled for the flagged rows.
     """
-    if isinstance(x, list):
-        return [str(it).strip() for it in x if str(it).strip()]
-    if pd.isna(x):
-        return []
-    s = str(x).strip()
-    try:
-        val = ast.literal_eval(s)
-        if isinstance(val, list):
-            return [str(it).strip() for it in val if str(it).strip()]
-    except Exception:
-        pass
-    return [t.strip() for t in s.split(",") if t.strip()]
-
-def find_anomalies_row(row) -> dict:
-    anomalies = []
-
-    # Normalize fields
-    bgm = to_bool(row.get("background_music_present", False))
-    sfx_present = to_bool(row.get("sound_effects_present", False))
-    b_roll_count = to_int(row.get("b_roll_count", 0))
-    anim_count = to_int(row.get("animated_graphics_count", 0))
-    trans_count = to_int(row.get("transitions_count", 0))
-    sfx_count = to_int(row.get("sound_effects_count", 0))
-
-    text_types_raw = parse_list_like(row.get("type_of_on_screen_text", []))
-    text_types_lower = {t.lower() for t in text_types_raw}
+    def bool_col(col):
+        if col not in df.columns:
+            return pd.Series(False, index=df.index)
+        return df[col].astype(str).str.strip().str.lower().isin(_TRUE_SET)
+
+    def count_col(col):
+        if col not in df.columns:
+            return pd.Series(0, index=df.index, dtype="int64")
+        return pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+
+    bgm = bool_col("background_music_present")
+    sfx_present = bool_col("sound_effects_present")
+    counts = pd.DataFrame({c: count_col(c) for c in OVERUSE_COUNT_COLS})
+
+    if "type_of_on_screen_text" in df.columns:
+        text_types = df["type_of_on_screen_text"].fillna("").astype(str).str.lower()
+    else:
+        text_types = pd.Series("", index=df.index)
 
     # Rule 1: sound anomaly — both present
-    rule1 = bgm and sfx_present
-    if rule1:
-        anomalies.append("Both sound effects and background music are present")
-
-    # Rule 2: overuse anomaly — any count > 5
-    overuse_fields = []
-    if b_roll_count > 5:
-        overuse_fields.append(f"b_roll_count={b_roll_count}")
-    if anim_count > 5:
-        overuse_fields.append(f"animated_graphics_count={anim_count}")
-    if trans_count > 5:
-        overuse_fields.append(f"transitions_count={trans_count}")
-    if sfx_count > 5:
-        overuse_fields.append(f"sound_effects_count={sfx_count}")
-    rule2 = len(overuse_fields) > 0
-    if rule2:
-        anomalies.append("High edit counts (>5): " + ", ".join(overuse_fields))
+    rule1 = bgm & sfx_present
+
+    # Rule 2: overuse anomaly — any count > threshold
+    overuse = counts.gt(OVERUSE_THRESHOLD)
+    rule2 = overuse.any(axis=1)
 
     # Rule 3: text conflict — transcript/text-on-screen AND specific keywords together
-    has_transcript_or_text = any(
-        t in {"transcript", "text on screen", "text-on-screen"} for t in text_types_lower
-    )
-    has_specific_keywords = any(
-        ("specific" in t and "keyword" in t) or t == "specific keywords"
-        for t in text_types_lower
-    )
-    rule3 = has_transcript_or_text and has_specific_keywords
-    if rule3:
-        anomalies.append("Both Transcript/Text-on-screen and Specific Keywords are present")
-
-    return {
+    has_transcript_or_text = text_types.str.contains(r"transcript|text[- ]on[- ]screen", regex=True)
+    has_specific_keywords = text_types.str.contains(r"specific\s*keyword", regex=True)
+    rule3 = has_transcript_or_text & has_specific_keywords
+
+    has_anomaly = rule1 | rule2 | rule3
+
+    def join_reasons(idx) -> str:
+        reasons = []
+        if rule1.at[idx]:
+            reasons.append("Both sound effects and background music are present")
+        if rule2.at[idx]:
+            fields = [f"{c}={counts.at[idx, c]}" for c in OVERUSE_COUNT_COLS if overuse.at[idx, c]]
+            reasons.append(f"High edit counts (>{OVERUSE_THRESHOLD}): " + ", ".join(fields))
+        if rule3.at[idx]:
+            reasons.append("Both Transcript/Text-on-screen and Specific Keywords are present")
+        return "; ".join(reasons)
+
+    joined = pd.Series("", index=df.index, dtype=object)
+    flagged = df.index[has_anomaly]
+    joined.loc[flagged] = [join_reasons(i) for i in flagged]
+
+    return pd.DataFrame({
         "rule_sound_and_bgm": rule1,
         "rule_overuse_counts": rule2,
         "rule_text_conflict": rule3,
-        "has_anomaly": (rule1 or rule2 or rule3),
-        "anomalies_joined": "; ".join(anomalies),
-    }
+        "has_anomaly": has_anomaly,
+        "anomalies_joined": joined,
+    })
 
 def main():
     if not INPUT_CSV.exists():
         raise FileNotFoundError(f"Input CSV not found: {INPUT_CSV.resolve()}")
 
-    df = pd.read_csv(INPUT_CSV)
+    # Callable usecols tolerates columns that are absent from older CSVs
+    # (find_anomalies already defaults missing columns)
+    df = pd.read_csv(INPUT_CSV, usecols=lambda col: col in NEEDED_COLS)
     id_col = "video_id" if "video_id" in df.columns else None
 
-    results = df.apply(find_anomalies_row, axis=1, result_type="expand")
+    results = find_anomalies(df)
 
     # Assemble output
     if id_col:
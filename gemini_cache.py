@@ -0,0 +1,87 @@
+"""
+Content-addressed disk cache for Gemini responses, shared by the
+analysis scripts.
+
+Entries are keyed by a hash of the video's bytes plus a short tag
+derived from the prompt, so a rerun over an overlapping dataset (or
+after a CSV row was cleared) returns the stored response instead of
+paying the upload/poll/generate cost again — and editing a prompt
+invalidates only that script's entries.
+"""
+import os
+import json
+import hashlib
+
+CACHE_DIR = "gemini_cache"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def video_hash(path) -> str:
+    """Fingerprint a video by content, streamed in 1 MiB chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb", buffering=1 << 20) as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def prompt_tag(prompt: str) -> str:
+    """Short tag that ties cache entries to a prompt version."""
+    return hashlib.blake2b(prompt.encode(), digest_size=4).hexdigest()
+
+
+def cache_path_for(vhash: str, tag: str) -> str:
+    return os.path.join(CACHE_DIR, f"{vhash}-{tag}.json")
+
+
+def cache_path(video_path, tag: str) -> str:
+    return cache_path_for(video_hash(video_path), tag)
+
+
+def load_cached(path):
+    """Return the cached response text, or None on a miss."""
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def store_cached(path, text: str) -> None:
+    # Write-then-rename so a crash mid-write never leaves a truncated
+    # entry, and concurrent writers can't clobber each other
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# --------------------------
+# Server-side upload records
+# --------------------------
+# The Files API keeps uploads around for ~48h. Remembering the file
+# name per video hash lets a rerun hand the existing handle straight to
+# generate_content instead of re-uploading gigabytes.
+
+def _upload_record_path(vhash: str) -> str:
+    return os.path.join(CACHE_DIR, f"{vhash}.upload.json")
+
+
+def load_upload_record(vhash: str):
+    """Return {"name": ..., "expiry": ts} for a remembered upload, or None."""
+    try:
+        with open(_upload_record_path(vhash)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def store_upload_record(vhash: str, name: str, expiry: float) -> None:
+    store_cached(_upload_record_path(vhash), json.dumps({"name": name, "expiry": expiry}))
+
+
+def drop_upload_record(vhash: str) -> None:
+    try:
+        os.remove(_upload_record_path(vhash))
+    except FileNotFoundError:
+        pass
@@ -1,11 +1,16 @@
 import os
-import time
 import json
+import time
+import random
+import asyncio
+
 import pandas as pd
 from google import genai
 from dotenv import load_dotenv
 from constants import VideoEditAnalysis
-import os
+from prompts import VIDEO_ANALYSIS_PROMPT
+from storage import read_table, write_table
+import gemini_cache
 
 # --------------------------
 # Setup
@@ -20,70 +25,349 @@ if not GEMINI_API_KEY:
 FILTERED_CSV_PATH = os.path.join("filtered", f"{GENRE}_filtered.csv")
 KEEP_DIR = f"kept_{GENRE}_videos"
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Generous request timeout (milliseconds) so multi-MB uploads on slow
+# links aren't aborted mid-transfer
+client = genai.Client(api_key=GEMINI_API_KEY, http_options={"timeout": 600_000})
+
+# Concurrency caps: total videos in flight, plus separate per-stage
+# limits so a task uploading the next video never has to wait behind
+# tasks sitting in generate_content — uploads for batch i+1 overlap
+# inference for batch i.
+GEMINI_CONCURRENCY = 8
+UPLOAD_CONCURRENCY = 3
+GENERATE_CONCURRENCY = 2
+
+# Backoff tuning. Sleeps use "full jitter" — uniform between zero and
+# the exponentially growing ceiling — so concurrent tasks that hit the
+# same 429/5xx burst don't all wake and retry in lockstep.
+POLL_BASE = 1.0
+POLL_CAP = 30.0
+RETRY_BASE = 1.0
+RETRY_CAP = 60.0
+MAX_GENERATE_ATTEMPTS = 5
+
+_TRANSIENT_MARKERS = ("429", "RESOURCE_EXHAUSTED", "500", "503", "UNAVAILABLE")
+
+GEMINI_MODEL = "gemini-2.5-pro"
+
+# Requests per minute allowed against the model endpoint
+GENERATE_RATE_PER_MIN = 60
+
+
+class _TokenBucket:
+    """
+    Minimal async token-bucket limiter. acquire() takes one token and
+    only sleeps when the per-minute budget is actually exhausted, so
+    throughput tracks the real quota instead of a fixed pause per call.
+    """
+
+    def __init__(self, rate: float, per: float = 60.0):
+        self._rate = rate / per  # tokens refilled per second
+        self._capacity = float(rate)
+        self._tokens = float(rate)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity,
+                               self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self._rate)
+                self._tokens = 1.0
+                self._last = time.monotonic()
+            self._tokens -= 1.0
+
+
+_generate_limiter = _TokenBucket(GENERATE_RATE_PER_MIN)
+
+# --------------------------
+# Prompt context cache
+# --------------------------
+# The analysis prompt is identical for every video, so it can live in
+# Gemini's context cache: uploaded once, referenced by name, billed at
+# the cached-token rate and skipped during per-request tokenization.
+# If the API refuses (e.g. the model's minimum cached-token threshold),
+# we fall back to sending the prompt inline — same results, full price.
+_prompt_cache_name = None
+_prompt_cache_unavailable = False
+
+
+async def _get_prompt_cache():
+    global _prompt_cache_name, _prompt_cache_unavailable
+    if _prompt_cache_unavailable:
+        return None
+    if _prompt_cache_name is None:
+        try:
+            cache = await client.aio.caches.create(
+                model=GEMINI_MODEL,
+                config={"contents": [VIDEO_ANALYSIS_PROMPT], "ttl": "3600s"},
+            )
+            _prompt_cache_name = cache.name
+        except Exception as e:
+            print(f"Context cache unavailable ({e}); sending the prompt inline.")
+            _prompt_cache_unavailable = True
+            return None
+    return _prompt_cache_name
+
+
+def _drop_prompt_cache():
+    """Forget an expired cache so the next call recreates it."""
+    global _prompt_cache_name
+    _prompt_cache_name = None
+
+
+def _disable_prompt_cache():
+    """Stop using the context cache for the rest of the run."""
+    global _prompt_cache_name, _prompt_cache_unavailable
+    _prompt_cache_name = None
+    _prompt_cache_unavailable = True
+
+# --------------------------
+# Response cache
+# --------------------------
+# Responses are cached on disk via the shared gemini_cache module,
+# keyed by video content + prompt version, so re-running over an
+# overlapping dataset doesn't pay the upload/poll/generate cost again.
+_PROMPT_TAG = gemini_cache.prompt_tag(VIDEO_ANALYSIS_PROMPT)
 
 
 # --------------------------
 # Gemini call
 # --------------------------
-def gemini_analysis(video_path: str) -> str:
-    myfile = client.files.upload(file=video_path)
+async def _upload_and_wait(video_path: str, upload_sem: asyncio.Semaphore):
+    """Upload a video and wait until the Files API finishes processing."""
+    async with upload_sem:
+        myfile = await client.aio.files.upload(file=video_path)
 
-    # Wait for processing
+    # Wait for processing — exponential backoff with full jitter: short
+    # videos get picked up within ~1s, long ones don't hammer files.get,
+    # and concurrent pollers stay desynchronized
+    poll_attempt = 0
     while True:
-        current_file = client.files.get(name=myfile.name)
+        current_file = await client.aio.files.get(name=myfile.name)
         if current_file.state != "PROCESSING":
             break
         print("Waiting for video to be processed...")
-        time.sleep(5)
+        await asyncio.sleep(random.uniform(0, min(POLL_CAP, POLL_BASE * 2 ** poll_attempt)))
+        poll_attempt += 1
+
+    return myfile
 
+
+async def gemini_analysis(
+    video_path: str,
+    upload_sem: asyncio.Semaphore,
+    generate_sem: asyncio.Semaphore,
+) -> str:
+    # Hashing reads the whole video — keep it off the event loop
+    cache_path = await asyncio.to_thread(gemini_cache.cache_path, video_path, _PROMPT_TAG)
+    cached_text = await asyncio.to_thread(gemini_cache.load_cached, cache_path)
+    if cached_text is not None:
+        try:
+            json.loads(cached_text)
+        except ValueError:
+            # Entries from before the write-side parse check may hold
+            # truncated text; drop them so the video gets re-analyzed
+            # instead of failing identically on every run
+            print(f"Bad cache entry for {video_path}; discarding.")
+            await asyncio.to_thread(os.remove, cache_path)
+        else:
+            print(f"Cache hit for {video_path}")
+            return cached_text
+
+    myfile = await _upload_and_wait(video_path, upload_sem)
     print("Video processed, sending to Gemini...")
 
-    prompt = ("You are a professional video analyzer for blind and low vision users. Carefully analyze the uploaded video and provide a detailed breakdown of all video editing effects and techniques used. "
-              "Answer the following questions about the video:"
-              "Provide a short summary of video content. Do not include any information about the video effects, the summary should only be focused on the content of the video"
-              "What is the category of the video?"
-              "What is the overall type of the video?"
-              "Is the video shot from a single camera angle or multiple angles?"
-              "Are there shot changes (hard cuts) or scene changes in the video? Small changes in motions or actions should not categorise as shot or scene changes."
-              "What is the average interval in seconds between shot or scene changes?"
-              "Provide count of shot and scene changes."
-              "Does the video include B-roll footage?  The B-roll footage refers to stock footage or any image/video differing from the main A-roll."
-              "If B-roll is present, is it a video or an image B-roll?"
-              "Provide count of B-roll footage?"
-              "Are there any animated graphics used? The animated graphics refers to any stickers, memes or GIFs in the video. Animated graphics does not include text overlays."
-              "If so, what types of animated graphics are present?"
-              "Provide count of animated graphics used?"
-              "Does the video include on-screen text?"
-              "What type of on-screen text appears?"
-              "Are there transitions between clips?"
-              "Provide count of the number of transitions."
-              "If yes, what types of transitions are used?"
-              "Does the video contain a voiceover or transcript?"
-              "If yes, is the voiceover narrating or independent of the visuals?"
-              "What is the playback speed of the video?"
-              "Is there background music added as editing effect in the video"
-              "Are there any sound effects added as editing effect in the video?"
-              "If sounds effects are present what type of sound effects are they?"
-              "Provide count of the number of sound effects present."
-              "After completing your analysis, review the video again. Verify each answer against the video content. If any part of your analysis does not match the observed edits, update your responses. Repeat this process until all answers are accurate and fully aligned with the video."
-              "Provide all timestamps as whole numbers in seconds, based on the actual video timeline, not on any on-screen timers or visual countdowns that may appear in the video."
-              "Return your response in JSON format")
-
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=[myfile, prompt],
-        config={
+    attempt = 1
+    cache_retries = 0
+    while True:
+        cached = await _get_prompt_cache()
+        config = {
             "response_mime_type": "application/json",
             "response_schema": VideoEditAnalysis,
-        },
-    )
-    print("===============================================")
-    print(response.text)
-    print("===============================================")
+        }
+        if cached:
+            config["cached_content"] = cached
+            contents = [myfile]
+        else:
+            contents = [myfile, VIDEO_ANALYSIS_PROMPT]
+
+        try:
+            async with generate_sem:
+                await _generate_limiter.acquire()
+                response = await client.aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=config,
+                )
+            break
+        except Exception as e:
+            msg = str(e)
+            # A server-side cache expiry isn't a failure of this request,
+            # so it doesn't consume the attempt budget; a recreated cache
+            # that 404s again means caching is broken — fall back to the
+            # inline prompt rather than looping on it
+            if cached and "NOT_FOUND" in msg:
+                cache_retries += 1
+                if cache_retries >= 2:
+                    print("Recreated prompt cache also missing; sending the prompt inline.")
+                    _disable_prompt_cache()
+                else:
+                    print("Prompt cache expired; recreating...")
+                    _drop_prompt_cache()
+                continue
+            transient = any(marker in msg for marker in _TRANSIENT_MARKERS)
+            if not transient or attempt == MAX_GENERATE_ATTEMPTS:
+                raise
+            delay = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** (attempt - 1)))
+            print(f"Transient Gemini error ({e}); retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+            # The upload usually survives a failed generation — only pay
+            # for a re-upload if the server no longer holds the file in
+            # a usable state (FAILED, expired, deleted, ...)
+            try:
+                state = (await client.aio.files.get(name=myfile.name)).state
+            except Exception:
+                state = None
+            if state != "ACTIVE":
+                print(f"Uploaded file unusable (state={state}); re-uploading...")
+                myfile = await _upload_and_wait(video_path, upload_sem)
+    # The raw response can be tens of KB; only dump it when asked —
+    # unconditional prints flush per line and drown the progress output
+    if os.getenv("DEBUG_GEMINI"):
+        print(f"--- Gemini response for {video_path} ---")
+        print(response.text)
+
+    # Only cache text that parses — a truncated response must stay
+    # retryable on the next run, not poison the content-addressed cache
+    try:
+        json.loads(response.text)
+    except ValueError as e:
+        print(f"Response for {video_path} is not valid JSON ({e}); not caching.")
+    else:
+        gemini_cache.store_cached(cache_path, response.text)
+
     return response.text
 
 
+# --------------------------
+# Incremental results sidecar
+# --------------------------
+# Rewriting the whole CSV after every video is O(N^2) I/O over a run.
+# Instead, completed analyses are appended to a JSONL sidecar (one line
+# per video) and merged into the CSV once at the end. If a run crashes,
+# the sidecar survives and is replayed on the next startup.
+FSYNC_EVERY = 20
+
+
+def _sidecar_path(result_csv: str) -> str:
+    return f"{result_csv}.partial.jsonl"
+
+
+# Results are accumulated per video and folded into the frame in one
+# aligned update every FLUSH_EVERY videos — new columns get added in
+# bulk instead of one insert per video.
+FLUSH_EVERY = 10
+
+
+def _flush_updates(df: pd.DataFrame, id_to_idx: dict, pending: dict) -> None:
+    """Fold pending {video_id: {col: val}} results into df in place."""
+    if not pending:
+        return
+    upd = pd.DataFrame.from_dict(pending, orient="index")
+    missing = [c for c in upd.columns if c not in df.columns]
+    if missing:
+        df[missing] = pd.NA
+    rows = [id_to_idx[v] for v in upd.index]
+    for col in upd.columns:
+        df.loc[rows, col] = upd[col].to_numpy()
+    pending.clear()
+
+
+def _replay_sidecar(df: pd.DataFrame, id_to_idx: dict, sidecar_path: str) -> int:
+    """Merge results left behind by a crashed run back into the frame."""
+    if not os.path.exists(sidecar_path):
+        return 0
+    recovered: dict = {}
+    with open(sidecar_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial last line from a crash mid-write
+            video_id = str(record.pop("video_id", ""))
+            if video_id in id_to_idx:
+                recovered[video_id] = record
+    replayed = len(recovered)
+    _flush_updates(df, id_to_idx, recovered)
+    return replayed
+
+
+async def _analyze_pending(df, id_to_idx, to_analyze, sidecar) -> None:
+    """
+    Run upload/poll/generate for every pending video concurrently.
+    The whole pipeline is network-bound, so a bounded set of in-flight
+    tasks gives near-linear speedup up to Gemini's rate limit; frame
+    and sidecar writes all happen on the event-loop thread.
+    """
+    sem = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    upload_sem = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    generate_sem = asyncio.Semaphore(GENERATE_CONCURRENCY)
+
+    async def process_one(item):
+        file_path, video_id, row_idx = item
+        async with sem:
+            print(f"Analyzing {video_id}...")
+            try:
+                raw_json = await gemini_analysis(file_path, upload_sem, generate_sem)
+                gemini_data = json.loads(raw_json)
+            except Exception as e:
+                print(f"Failed to analyze or parse for {video_id}: {e}")
+                return video_id, None
+
+            # Flatten list fields to CSV-friendly strings in one pass,
+            # rebuilding the dict instead of mutating while iterating
+            gemini_data = {
+                k: (", ".join(x if isinstance(x, str) else str(x) for x in v)
+                    if isinstance(v, list) else v)
+                for k, v in gemini_data.items()
+            }
+            return video_id, gemini_data
+
+    pending_updates: dict = {}
+    completed_since_sync = 0
+    try:
+        for fut in asyncio.as_completed([process_one(item) for item in to_analyze]):
+            video_id, gemini_data = await fut
+            if gemini_data is None:
+                continue
+
+            pending_updates[video_id] = gemini_data
+            if len(pending_updates) >= FLUSH_EVERY:
+                _flush_updates(df, id_to_idx, pending_updates)
+
+            # Append to the sidecar; fsync periodically so a crash
+            # loses at most the last few results, not the whole run
+            sidecar.write(json.dumps({"video_id": video_id, **gemini_data}) + "\n")
+            completed_since_sync += 1
+            if completed_since_sync >= FSYNC_EVERY:
+                sidecar.flush()
+                os.fsync(sidecar.fileno())
+                completed_since_sync = 0
+
+            print(f"Updated analysis for video ID: {video_id}")
+    finally:
+        _flush_updates(df, id_to_idx, pending_updates)
+
+
 # --------------------------
 # Main analysis loop
 # --------------------------
@@ -95,62 +379,76 @@ def analyze_and_save(output_dir: str, result_csv: str) -> None:
     if not os.path.isdir(output_dir):
         raise FileNotFoundError(f"Kept videos folder not found: {output_dir}")
 
-    df = pd.read_csv(result_csv)
+    df = read_table(result_csv)
     if "video_id" not in df.columns:
         raise ValueError("Filtered CSV must contain a 'video_id' column.")
 
-    # Normalize for membership checks
-    df["video_id"] = df["video_id"].astype(str)
-    ids_in_csv = set(df["video_id"].values)
-
-    for filename in os.listdir(output_dir):
-        if not filename.lower().endswith(".mp4"):
-            continue
+    # Dedup here instead of a separate read-everything-again pass;
+    # duplicate ids would also make the id->row index ambiguous
+    before = len(df)
+    df = df.drop_duplicates(subset="video_id", keep="first")
+    if len(df) < before:
+        print(f"Dropped {before - len(df)} duplicate video_id row(s).")
 
-        video_id = filename.split("_")[-1].replace(".mp4", "")
-        file_path = os.path.join(output_dir, filename)
+    # Normalize once and index video_id -> row label so every lookup in
+    # the loop is a hash probe instead of a full-column scan
+    df["video_id"] = df["video_id"].astype(str)
+    id_to_idx = dict(zip(df["video_id"], df.index))
 
-        # Skip if not in CSV
-        if video_id not in ids_in_csv:
-            print(f"Skipping {video_id}: not in CSV.")
-            continue
+    # Recover any results a previous crashed run left in the sidecar
+    sidecar_path = _sidecar_path(result_csv)
+    replayed = _replay_sidecar(df, id_to_idx, sidecar_path)
+    if replayed:
+        print(f"Replayed {replayed} result(s) from {sidecar_path}")
 
-        # Skip if already analyzed (non-empty video_summary)
-        already_done = False
-        if "video_summary" in df.columns:
-            existing = df.loc[df["video_id"] == video_id, "video_summary"].values[0]
-            if pd.notna(existing) and str(existing).strip() != "":
-                already_done = True
+    # One scandir pass gives name, full path, and cached file type per
+    # entry — no per-file os.path.join or extra stat
+    with os.scandir(output_dir) as it:
+        files = [
+            (e.name, e.path)
+            for e in it
+            if e.name.lower().endswith(".mp4") and e.is_file()
+        ]
 
-        if already_done:
-            print(f"Skipping {video_id}: already analyzed.")
-            continue
+    # Decide what still needs analysis with vectorized masks instead of
+    # a per-file frame lookup
+    file_ids = pd.Series(
+        [name.split("_")[-1].replace(".mp4", "") for name, _ in files],
+        dtype=object,
+    )
+    file_paths = [path for _, path in files]
 
-        print(f"Analyzing {video_id}...")
-        try:
-            raw_json = gemini_analysis(file_path)
-            gemini_data = json.loads(raw_json)
-        except Exception as e:
-            print(f"Failed to analyze or parse for {video_id}: {e}")
-            continue
+    in_csv = file_ids.isin(id_to_idx).to_numpy()
 
-        # Convert lists to CSV-friendly strings (optional)
-        for k, v in list(gemini_data.items()):
-            if isinstance(v, list):
-                gemini_data[k] = ", ".join(map(str, v))
+    # IDs whose video_summary is already filled in
+    if "video_summary" in df.columns:
+        summaries = df["video_summary"]
+        done_mask = summaries.notna() & summaries.astype(str).str.strip().ne("")
+        done_ids = set(df.loc[done_mask, "video_id"])
+    else:
+        done_ids = set()
+    already_done = file_ids.isin(done_ids).to_numpy()
 
-        # Upsert columns and update row
-        for k, v in gemini_data.items():
-            if k not in df.columns:
-                df[k] = pd.NA
-            df.loc[df["video_id"] == video_id, k] = v
+    to_analyze = [
+        (file_paths[i], file_ids.iat[i], id_to_idx[file_ids.iat[i]])
+        for i in range(len(files))
+        if in_csv[i] and not already_done[i]
+    ]
 
-        print(f"Updated analysis for video ID: {video_id}")
-        df.to_csv(result_csv, index=False)
-        print(f"Saved CSV after updating {video_id}")
+    print(f"Skipped {(~in_csv).sum()} file(s) not in CSV, "
+          f"{(in_csv & already_done).sum()} already analyzed.")
+    print(f"{len(to_analyze)} video(s) to analyze.")
 
-        time.sleep(10)  # Optional rate-limit cushion
+    sidecar = open(sidecar_path, "a", buffering=1 << 20)
+    try:
+        asyncio.run(_analyze_pending(df, id_to_idx, to_analyze, sidecar))
+    finally:
+        sidecar.close()
+        # Consolidate into the main table exactly once
+        write_table(df, result_csv)
 
+    # CSV now holds everything the sidecar did — safe to drop it
+    os.remove(sidecar_path)
     print(f"Final CSV saved to {result_csv}")
 
 
@@ -1,12 +1,14 @@
 import pandas as pd
 
-# Load CSV
-df = pd.read_csv("filtered/education_filtered.csv")
+from storage import read_table, write_table
+
+# Load table (CSV by default; STORE_FORMAT=parquet switches the store)
+df = read_table("filtered/education_filtered.csv")
 
 # Drop duplicate video_id rows (keep first occurrence)
 df_no_duplicates = df.drop_duplicates(subset='video_id', keep='first')
 
 # Save to new file (or overwrite original if desired)
-df_no_duplicates.to_csv("education_filtered.csv", index=False)
+write_table(df_no_duplicates, "education_filtered.csv")
 
 print(f"Removed duplicates. Original rows: {len(df)}, After deduplication: {len(df_no_duplicates)}")
@@ -16,11 +16,12 @@ Usage:
 """
 
 import argparse
-import glob
 import json
 import os
+import re
 import sys
 import time
+from dataclasses import dataclass, field, asdict
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
@@ -57,7 +58,7 @@ except Exception as e:
 # -----------------------------------------
 
 POSSIBLE_ID_COLS = ["video_id", "id", "videoId", "videoID", "video_key", "videoKey"]
-VIDEO_EXTS = ["*.mp4", "*.mov", "*.mkv", "*.avi", "*.webm", "*.m4v"]
+VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v"}
 
 # Map boolean → dependent fields to auto-clear if set False
 DEPENDENTS: Dict[str, List[str]] = {
@@ -105,9 +106,19 @@ FLOAT_FIELDS = [
 
 # String fields (plain)
 STRING_FIELDS = [
+    "voiceover_type",
     "sound_effects_type",
 ]
 
+# Precomputed per-enum name lookups: a frozenset for membership tests
+# and a lowercase→canonical map so reviewers don't have to match case
+_ALL_ENUMS = (
+    camera_angles, overall_type, text_type, transitions,
+    category, playback_speed, broll_type, animated_graphics_type,
+)
+ENUM_NAMES = {E: frozenset(E.__members__) for E in _ALL_ENUMS}
+ENUM_CI = {E: {n.lower(): n for n in E.__members__} for E in _ALL_ENUMS}
+
 # ---- Skip re-prompting these in the generic loops (already handled above) ----
 DEPENDENT_INT_FIELDS = {
     "shot_or_scene_change_count",
@@ -117,35 +128,167 @@ DEPENDENT_INT_FIELDS = {
     "sound_effects_count",
 }
 DEPENDENT_STRING_FIELDS = {
+    "voiceover_type",
     "sound_effects_type",
 }
 
-def to_csv_list(val) -> str:
+# Every editable column, in prompt order
+EDIT_FIELDS: List[str] = (
+    BOOL_FIELDS + INT_FIELDS + FLOAT_FIELDS
+    + list(LIST_ENUM_FIELDS.keys()) + STRING_FIELDS
+)
+
+
+@dataclass
+class RowView:
     """
-    Serialize list-like values to 'A, B, C' (no brackets).
-    - If empty or null -> '' (blank cell)
-    - Accepts actual lists, JSON-ish strings, or existing comma-separated strings.
+    Typed working copy of the editable slice of one row. The prompt
+    loop mutates this instead of shuffling dicts, and the frame only
+    sees the result at flush time.
     """
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return ""
-    if isinstance(val, list):
-        items = [str(x).strip() for x in val if str(x).strip()]
-        return ", ".join(items) if items else ""
+    video_id: str = ""
+    # booleans
+    shot_or_scene_changes_present: bool = False
+    b_roll_footage_present: bool = False
+    animated_graphics_present: bool = False
+    on_screen_text_present: bool = False
+    transitions_present: bool = False
+    voiceover_present: bool = False
+    background_music_present: bool = False
+    sound_effects_present: bool = False
+    # counts
+    shot_or_scene_change_count: int = 0
+    b_roll_count: int = 0
+    animated_graphics_count: int = 0
+    transitions_count: int = 0
+    sound_effects_count: int = 0
+    average_interval_shot_or_scene_changes_seconds: float = 0.0
+    # lists of enum names
+    b_roll_visuals: List[str] = field(default_factory=list)
+    types_of_animated_graphics: List[str] = field(default_factory=list)
+    type_of_on_screen_text: List[str] = field(default_factory=list)
+    types_of_transitions: List[str] = field(default_factory=list)
+    # plain strings
+    voiceover_type: str = ""
+    sound_effects_type: str = ""
+
+    @classmethod
+    def from_row(cls, video_id: str, row: pd.Series) -> "RowView":
+        kwargs: Dict[str, Any] = {"video_id": video_id}
+        for name in EDIT_FIELDS:
+            if name in row.index and not (isinstance(row[name], float) and pd.isna(row[name])):
+                kwargs[name] = row[name]
+        for lf in LIST_ENUM_FIELDS:
+            kwargs[lf] = parse_list(kwargs.get(lf, []))
+        return cls(**kwargs)
+
+
+def changed_csv_fields(view: "RowView", changes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The edited fields of a view, lists flattened for the CSV. Only keys
+    present in the change log are returned — from_row substitutes
+    defaults for NA cells, so writing the whole view back would quietly
+    turn untouched blanks into 0/False.
+    """
+    out: Dict[str, Any] = {}
+    for name in changes:
+        val = getattr(view, name)
+        if name in LIST_ENUM_FIELDS:
+            val = to_csv_list(val)
+        out[name] = val
+    return out
+
+
+def _to_int(x) -> int:
+    try:
+        return int(float(x))
+    except Exception:
+        return 0
+
+def _has_value(x) -> bool:
+    if isinstance(x, list):
+        return bool(x)
+    if isinstance(x, str):
+        return bool(x.strip())
+    return _to_int(x) != 0
+
+# A row may only skip human review when, *after* auto-fix, it no longer
+# satisfies the rule that flagged it — re-checked against the repaired
+# view, never assumed from the reason text. Reasons whose rules we
+# can't re-evaluate here (sound/music conflicts, transcript-vs-keywords)
+# always go to a human.
+_OVERUSE_REASON_RE = re.compile(r"^High edit counts \(>(\d+)\)", re.IGNORECASE)
+
+def _reason_resolved(view: "RowView", part: str) -> bool:
+    m = _OVERUSE_REASON_RE.match(part)
+    if not m:
+        return False
+    # "High edit counts (>5): b_roll_count=7, ..." — the rule fires on
+    # the counts themselves, so it only counts as resolved if every
+    # flagged count is back at or under the threshold
+    threshold = int(m.group(1))
+    fields = re.findall(r"(\w+)=", part)
+    return bool(fields) and all(
+        _to_int(getattr(view, f, 0)) <= threshold for f in fields
+    )
+
+def anomalies_resolved(view: "RowView", reason: str) -> bool:
+    parts = [p.strip() for p in reason.split(";") if p.strip()]
+    return bool(parts) and all(_reason_resolved(view, p) for p in parts)
 
+def auto_fix(view: "RowView") -> Dict[str, Dict[str, Any]]:
+    """
+    Mechanical consistency repairs that don't need the video:
+      - a presence flag is False but its count is positive -> the count
+        is the stronger signal, flip the flag True
+      - a presence flag is False with stale dependents -> clear them
+    Returns the changes in change-log form, tagged "source": "auto".
+    """
+    changes: Dict[str, Dict[str, Any]] = {}
+    for bf in BOOL_FIELDS:
+        if getattr(view, bf):
+            continue
+        deps = DEPENDENTS.get(bf, [])
+        count_deps = [d for d in deps if d in INT_FIELDS]
+        if any(_to_int(getattr(view, d)) > 0 for d in count_deps):
+            changes[bf] = {"old": False, "new": True, "source": "auto"}
+            setattr(view, bf, True)
+        else:
+            stale = [d for d in deps if _has_value(getattr(view, d))]
+            if stale:
+                for d in stale:
+                    changes[d] = {"old": getattr(view, d), "new": None, "source": "auto"}
+                apply_auto_clear(view, bf, False)
+                for d in stale:
+                    changes[d]["new"] = getattr(view, d)
+    return changes
+
+def parse_list(val) -> List[str]:
+    """
+    Normalize any list-like cell to a list of stripped strings.
+    Accepts actual lists, JSON-ish '[...]' strings, or plain
+    comma-separated text; None/NaN/empty -> []. Only bracketed input
+    ever reaches the JSON parser, so the exception path stays cold.
+    """
+    if isinstance(val, list):
+        return [str(x).strip() for x in val if str(x).strip()]
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return []
     s = str(val).strip()
     if not s or s == "[]":
-        return ""
-    # If it looks like JSON list, parse then join
-    if s.startswith("[") and s.endswith("]"):
+        return []
+    if s[0] == "[" and s[-1] == "]":
         try:
             arr = json.loads(s)
-            if isinstance(arr, list):
-                items = [str(x).strip() for x in arr if str(x).strip()]
-                return ", ".join(items) if items else ""
-        except Exception:
-            pass
-    # Already plain text; keep it
-    return s
+        except ValueError:
+            arr = None
+        if isinstance(arr, list):
+            return [str(x).strip() for x in arr if str(x).strip()]
+    return [t.strip() for t in s.split(",") if t.strip()]
+
+def to_csv_list(val) -> str:
+    """Serialize list-like values to 'A, B, C' (no brackets, '' if empty)."""
+    return ", ".join(parse_list(val))
 
 
 def detect_id_col(df: pd.DataFrame) -> Optional[str]:
@@ -160,38 +303,28 @@ def coerce_bool(x):
     s = str(x).strip().lower()
     return s in {"true", "1", "yes", "y", "t"}
 
-def safe_parse_list(s) -> List[str]:
-    """Accepts JSON-like lists or comma-separated strings; returns list of strings (stripped)."""
-    if isinstance(s, list):
-        return [str(x).strip() for x in s if str(x).strip()]
-    if pd.isna(s):
-        return []
-    text = str(s).strip()
-    if not text:
-        return []
-    # Try JSON-ish
-    if text.startswith("[") and text.endswith("]"):
-        try:
-            arr = json.loads(text)
-            if isinstance(arr, list):
-                return [str(x).strip() for x in arr if str(x).strip()]
-        except Exception:
-            pass
-    # Fallback: comma-separated
-    return [t.strip() for t in text.split(",") if t.strip()]
-
-def find_video(video_id: str, videos_dir: str) -> Optional[str]:
-    # Try exact filename with any extension
-    for pattern in VIDEO_EXTS:
-        hits = glob.glob(os.path.join(videos_dir, f"{video_id}{pattern[1:]}"))
-        if hits:
-            return hits[0]
-    # Try glob *video_id*.* to be lenient
-    for pattern in VIDEO_EXTS:
-        hits = glob.glob(os.path.join(videos_dir, f"*{video_id}*{pattern[1:]}"))
-        if hits:
-            return hits[0]
-    return None
+def build_video_index(videos_dir: str) -> Dict[str, str]:
+    """One scandir pass over the videos folder: stem -> full path."""
+    index: Dict[str, str] = {}
+    try:
+        with os.scandir(videos_dir) as it:
+            for de in it:
+                if not de.is_file():
+                    continue
+                stem, ext = os.path.splitext(de.name)
+                if ext.lower() in VIDEO_EXTS:
+                    index.setdefault(stem, de.path)
+    except FileNotFoundError:
+        pass
+    return index
+
+def find_video(video_id: str, files_index: Dict[str, str]) -> Optional[str]:
+    # Exact stem match first, then the lenient *video_id* fallback the
+    # old glob version offered — against the in-memory index, not disk
+    hit = files_index.get(video_id)
+    if hit:
+        return hit
+    return next((p for stem, p in files_index.items() if video_id in stem), None)
 
 import subprocess
 import platform
@@ -263,12 +396,11 @@ def prompt_enum(label: str, E, current) -> Optional[str]:
     s = input(f"{label} [current={current}] (choose by NAME; {enum_name_list(E)}; Enter=keep): ").strip()
     if s == "":
         return None
-    try:
-        _ = E[s]  # validate
-        return s
-    except Exception:
+    canonical = ENUM_CI[E].get(s.lower())
+    if canonical is None:
         print("  (invalid name, keeping current)")
         return None
+    return canonical
 
 def prompt_enum_list(label: str, E, current_list: List[str]) -> Optional[List[str]]:
     s = input(f"{label} [current={current_list}] (comma-separated NAMES; {enum_name_list(E)}; Enter=keep): ").strip()
@@ -277,31 +409,25 @@ def prompt_enum_list(label: str, E, current_list: List[str]) -> Optional[List[st
     parts = [p.strip() for p in s.split(",") if p.strip()]
     valid = []
     for p in parts:
-        if p in E.__members__:
-            valid.append(p)
+        canonical = ENUM_CI[E].get(p.lower())
+        if canonical is not None:
+            valid.append(canonical)
         else:
             print(f"  (ignored invalid: {p})")
     return valid
 
-def apply_auto_clear(row: dict, field: str, value: bool) -> None:
+def apply_auto_clear(view: "RowView", bool_field: str, value: bool) -> None:
     """If boolean set to False, auto-clear its dependent fields."""
-    if not value and field in DEPENDENTS:
-        for dep in DEPENDENTS[field]:
+    if not value and bool_field in DEPENDENTS:
+        for dep in DEPENDENTS[bool_field]:
             if dep in INT_FIELDS:
-                row[dep] = 0
+                setattr(view, dep, 0)
             elif dep in FLOAT_FIELDS:
-                row[dep] = 0.0
+                setattr(view, dep, 0.0)
             elif dep in LIST_ENUM_FIELDS:
-                row[dep] = []
+                setattr(view, dep, [])
             else:
-                row[dep] = ""
-
-def row_to_display_dict(row: pd.Series) -> Dict[str, Any]:
-    # Convert lists from strings, leave primitives as-is
-    d = dict(row)
-    for lf in LIST_ENUM_FIELDS.keys():
-        d[lf] = safe_parse_list(d.get(lf, []))
-    return d
+                setattr(view, dep, "")
 
 def validate_optional(row: dict) -> Optional[str]:
     """
@@ -316,7 +442,7 @@ def validate_optional(row: dict) -> Optional[str]:
             if isinstance(vals, list):
                 new_vals = []
                 for v in vals:
-                    if v in E.__members__:
+                    if v in ENUM_NAMES[E]:
                         new_vals.append(E[v].value)
                     else:
                         new_vals.append(str(v))
@@ -343,6 +469,10 @@ def main():
     ap.add_argument("--out", default="updated_videos.csv", help="Output CSV path (ignored if --inplace)")
     ap.add_argument("--log", default="edits_log.jsonl", help="Change log JSONL path")
     ap.add_argument("--inplace", action="store_true", help="Write updates back into --original")
+    ap.add_argument("--checkpoint-every", type=int, default=10,
+                    help="Write the CSV after this many edited rows (it is always written on exit)")
+    ap.add_argument("--no-auto-fix", action="store_true",
+                    help="Disable rule-based auto-repairs; review every anomaly interactively")
     args = ap.parse_args()
 
     # Decide output path
@@ -374,20 +504,76 @@ def main():
                 df[col] = ""
 
     print(f"Loaded {len(adf)} anomalies. Starting review...")
-    changes = []
+
+    # Rewriting the full CSV after every edited row is quadratic I/O
+    # over a session. Instead the change log gets each edit immediately
+    # (so nothing is lost on a crash) and the CSV itself is written
+    # every --checkpoint-every rows plus once on the way out — including
+    # Ctrl-C, which is how review sessions usually end.
+    checkpoint_every = max(1, args.checkpoint_every)
+    log_f = open(args.log, "a", encoding="utf-8")
+    files_index = build_video_index(args.videos_dir)
+
+    try:
+        _review_loop(args, df, adf, vid_col_main, vid_col_anom,
+                     out_path, checkpoint_every, log_f, files_index)
+    except KeyboardInterrupt:
+        print("\nInterrupted — saving progress...")
+    finally:
+        atomic_write_csv(df, out_path)
+        print(f"Saved CSV → {out_path}")
+        log_f.close()
+
+
+def _flush_dirty(df: pd.DataFrame, dirty: Dict[Any, Dict[str, Any]]) -> None:
+    """Write accumulated {row label: edited fields} into df in bulk."""
+    if not dirty:
+        return
+    # Each row carries only the fields that actually changed, so group
+    # values per column and write each column with just its rows — a
+    # frame built from the ragged dicts would fill the gaps with NaN
+    # and clobber untouched cells
+    by_col: Dict[str, Dict[Any, Any]] = {}
+    for row_label, fields_changed in dirty.items():
+        for col, val in fields_changed.items():
+            if col in df.columns:
+                by_col.setdefault(col, {})[row_label] = val
+    for col, vals in by_col.items():
+        df.loc[list(vals), col] = list(vals.values())
+    dirty.clear()
+
+
+def _review_loop(args, df, adf, vid_col_main, vid_col_anom,
+                 out_path, checkpoint_every, log_f, files_index):
+    dirty: Dict[Any, Dict[str, Any]] = {}
+    try:
+        _review_rows(args, df, adf, vid_col_main, vid_col_anom,
+                     out_path, checkpoint_every, log_f, files_index, dirty)
+    finally:
+        # Fold any rows edited since the last checkpoint into the frame
+        # before main() writes it out
+        _flush_dirty(df, dirty)
+
+
+def _review_rows(args, df, adf, vid_col_main, vid_col_anom,
+                 out_path, checkpoint_every, log_f, files_index, dirty):
+    dirty_count = 0
+
+    # One normalization pass up front; per-anomaly lookup is then a
+    # dict probe instead of a fresh astype+strip scan of the column
+    vid_to_idx = dict(zip(df[vid_col_main].astype(str).str.strip(), df.index))
 
     for i, anom in adf.iterrows():
         vid = str(anom[vid_col_anom]).strip()
         if not vid:
             continue
 
-        matches = df[df[vid_col_main].astype(str).str.strip() == vid]
-        if matches.empty:
+        idx = vid_to_idx.get(vid)
+        if idx is None:
             print(f"\n[{i+1}/{len(adf)}] Video ID in anomalies not found in original: {vid}")
             continue
 
-        idx = matches.index[0]
-        current = row_to_display_dict(matches.iloc[0])
+        view = RowView.from_row(vid, df.loc[idx])
 
         print("\n" + "="*80)
         print(f"[{i + 1}/{len(adf)}] Reviewing Video ID: {vid}")
@@ -397,7 +583,27 @@ def main():
         if anomaly_reason:
             print(f"[Anomaly] {anomaly_reason}")
 
-        video_path = find_video(vid, args.videos_dir)
+        # Mechanical repairs first; the prompt path is only skipped if
+        # the repaired row no longer triggers the rule that flagged it
+        auto_changes = {}
+        if not args.no_auto_fix:
+            auto_changes = auto_fix(view)
+            if auto_changes:
+                print(f"[auto-fix] {', '.join(auto_changes)}")
+        if auto_changes and anomalies_resolved(view, anomaly_reason):
+            log_f.write(json.dumps({"video_id": vid, "changes": auto_changes}) + "\n")
+            log_f.flush()
+            dirty[idx] = changed_csv_fields(view, auto_changes)
+            print("Resolved by auto-fix; skipping interactive review.")
+            dirty_count += 1
+            if dirty_count >= checkpoint_every:
+                _flush_dirty(df, dirty)
+                atomic_write_csv(df, out_path)
+                print(f"Checkpoint saved → {out_path}\n")
+                dirty_count = 0
+            continue
+
+        video_path = find_video(vid, files_index)
         if video_path:
             print(f"Opening video: {video_path}")
             action = play_video(video_path)
@@ -413,145 +619,132 @@ def main():
         # Interactive editing prompts
         print("\n--- Edit values (Enter = keep current) ---")
 
-        updated = dict(current)  # start from current
-        row_changes = {}
+        row_changes = dict(auto_changes)
+
+        def record(name, new_val):
+            row_changes[name] = {"old": getattr(view, name), "new": new_val}
+            setattr(view, name, new_val)
 
         # 1) Booleans first, because they affect dependents
         for bf in BOOL_FIELDS:
-            newb = prompt_bool(bf, updated.get(bf))
-            if newb is not None and newb != updated.get(bf):
-                row_changes[bf] = {"old": updated.get(bf), "new": newb}
-                updated[bf] = newb
-                apply_auto_clear(updated, bf, newb)
+            newb = prompt_bool(bf, getattr(view, bf))
+            if newb is not None and newb != getattr(view, bf):
+                record(bf, newb)
+                # Dependent clears must land in the change log too, or
+                # they'd never reach the CSV now that only changed
+                # fields are written back
+                before = {d: getattr(view, d) for d in DEPENDENTS.get(bf, [])}
+                apply_auto_clear(view, bf, newb)
+                for d, old in before.items():
+                    if getattr(view, d) != old:
+                        row_changes[d] = {"old": old, "new": getattr(view, d)}
 
         # 2) Dependent numeric/string prompts (only if their parent is True)
         # Shot/scene changes
-        if updated.get("shot_or_scene_changes_present"):
-            val = prompt_int("shot_or_scene_change_count", updated.get("shot_or_scene_change_count"))
+        if view.shot_or_scene_changes_present:
+            val = prompt_int("shot_or_scene_change_count", view.shot_or_scene_change_count)
             if val is not None:
-                row_changes["shot_or_scene_change_count"] = {"old": updated.get("shot_or_scene_change_count"), "new": val}
-                updated["shot_or_scene_change_count"] = val
+                record("shot_or_scene_change_count", val)
 
             val = prompt_float("average_interval_shot_or_scene_changes_seconds",
-                               updated.get("average_interval_shot_or_scene_changes_seconds"))
+                               view.average_interval_shot_or_scene_changes_seconds)
             if val is not None:
-                row_changes["average_interval_shot_or_scene_changes_seconds"] = {
-                    "old": updated.get("average_interval_shot_or_scene_changes_seconds"), "new": val
-                }
-                updated["average_interval_shot_or_scene_changes_seconds"] = val
+                record("average_interval_shot_or_scene_changes_seconds", val)
 
         # B-roll
-        if updated.get("b_roll_footage_present"):
-            val = prompt_int("b_roll_count", updated.get("b_roll_count"))
+        if view.b_roll_footage_present:
+            val = prompt_int("b_roll_count", view.b_roll_count)
             if val is not None:
-                row_changes["b_roll_count"] = {"old": updated.get("b_roll_count"), "new": val}
-                updated["b_roll_count"] = val
-            val = prompt_enum_list("b_roll_visuals", broll_type, updated.get("b_roll_visuals", []))
+                record("b_roll_count", val)
+            val = prompt_enum_list("b_roll_visuals", broll_type, view.b_roll_visuals)
             if val is not None:
-                row_changes["b_roll_visuals"] = {"old": updated.get("b_roll_visuals"), "new": val}
-                updated["b_roll_visuals"] = val
+                record("b_roll_visuals", val)
 
         # Animated graphics
-        if updated.get("animated_graphics_present"):
-            val = prompt_int("animated_graphics_count", updated.get("animated_graphics_count"))
+        if view.animated_graphics_present:
+            val = prompt_int("animated_graphics_count", view.animated_graphics_count)
             if val is not None:
-                row_changes["animated_graphics_count"] = {"old": updated.get("animated_graphics_count"), "new": val}
-                updated["animated_graphics_count"] = val
+                record("animated_graphics_count", val)
             val = prompt_enum_list("types_of_animated_graphics", animated_graphics_type,
-                                   updated.get("types_of_animated_graphics", []))
+                                   view.types_of_animated_graphics)
             if val is not None:
-                row_changes["types_of_animated_graphics"] = {
-                    "old": updated.get("types_of_animated_graphics"), "new": val
-                }
-                updated["types_of_animated_graphics"] = val
+                record("types_of_animated_graphics", val)
 
         # On-screen text
-        if updated.get("on_screen_text_present"):
-            val = prompt_enum_list("type_of_on_screen_text", text_type, updated.get("type_of_on_screen_text", []))
+        if view.on_screen_text_present:
+            val = prompt_enum_list("type_of_on_screen_text", text_type, view.type_of_on_screen_text)
             if val is not None:
-                row_changes["type_of_on_screen_text"] = {"old": updated.get("type_of_on_screen_text"), "new": val}
-                updated["type_of_on_screen_text"] = val
+                record("type_of_on_screen_text", val)
 
         # Transitions
-        if updated.get("transitions_present"):
-            val = prompt_int("transitions_count", updated.get("transitions_count"))
+        if view.transitions_present:
+            val = prompt_int("transitions_count", view.transitions_count)
+            if val is not None:
+                record("transitions_count", val)
+            val = prompt_enum_list("types_of_transitions", transitions, view.types_of_transitions)
             if val is not None:
-                row_changes["transitions_count"] = {"old": updated.get("transitions_count"), "new": val}
-                updated["transitions_count"] = val
-            val = prompt_enum_list("types_of_transitions", transitions, updated.get("types_of_transitions", []))
+                record("types_of_transitions", val)
+
+        # Voiceover
+        if view.voiceover_present:
+            val = prompt_str("voiceover_type", view.voiceover_type)
             if val is not None:
-                row_changes["types_of_transitions"] = {"old": updated.get("types_of_transitions"), "new": val}
-                updated["types_of_transitions"] = val
+                record("voiceover_type", val)
 
         # Sound effects
-        if updated.get("sound_effects_present"):
-            val = prompt_int("sound_effects_count", updated.get("sound_effects_count"))
+        if view.sound_effects_present:
+            val = prompt_int("sound_effects_count", view.sound_effects_count)
             if val is not None:
-                row_changes["sound_effects_count"] = {"old": updated.get("sound_effects_count"), "new": val}
-                updated["sound_effects_count"] = val
-            val = prompt_str("sound_effects_type", updated.get("sound_effects_type", ""))
+                record("sound_effects_count", val)
+            val = prompt_str("sound_effects_type", view.sound_effects_type)
             if val is not None:
-                row_changes["sound_effects_type"] = {"old": updated.get("sound_effects_type"), "new": val}
-                updated["sound_effects_type"] = val
+                record("sound_effects_type", val)
 
         # Strings (generic) — skip ones already handled above
         for f in STRING_FIELDS:
             if f in DEPENDENT_STRING_FIELDS:
                 continue
-            cur = updated.get(f, "")
-            newv = prompt_str(f, cur)
+            newv = prompt_str(f, getattr(view, f))
             if newv is not None:
-                row_changes[f] = {"old": cur, "new": newv}
-                updated[f] = newv
+                record(f, newv)
 
         # Numeric (generic) — skip ones already handled above
         for f in INT_FIELDS:
             if f in DEPENDENT_INT_FIELDS:
                 continue
-            cur = updated.get(f, 0)
-            newv = prompt_int(f, cur)
+            newv = prompt_int(f, getattr(view, f))
             if newv is not None:
-                row_changes[f] = {"old": cur, "new": newv}
-                updated[f] = newv
+                record(f, newv)
 
         for f in FLOAT_FIELDS:
-            cur = updated.get(f, 0.0)
-            newv = prompt_float(f, cur)
+            newv = prompt_float(f, getattr(view, f))
             if newv is not None:
-                row_changes[f] = {"old": cur, "new": newv}
-                updated[f] = newv
+                record(f, newv)
 
         # Optional validation (won’t block saving)
-        err = validate_optional(updated)
+        err = validate_optional(asdict(view))
         if err:
             print(f"[Validation warning] {err}")
 
-        # Persist updates back to DataFrame
-        # Convert list fields to JSON strings for the CSV
-        # Convert list fields to CSV-friendly comma-separated strings
-        for lf in LIST_ENUM_FIELDS.keys():
-            updated[lf] = to_csv_list(updated.get(lf, ""))
-
-        for k, v in updated.items():
-            if k in df.columns:
-                df.at[idx, k] = v
+        # Queue only the fields that changed (lists flattened for the
+        # CSV); untouched cells — including NA ones that from_row
+        # defaulted — are never rewritten
+        if row_changes:
+            dirty[idx] = changed_csv_fields(view, row_changes)
 
+        # Log the edit right away — the JSONL is the crash-recovery
+        # record, so it must never lag behind the in-memory frame
         if row_changes:
-            changes.append({"video_id": vid, "changes": row_changes})
+            log_f.write(json.dumps({"video_id": vid, "changes": row_changes}) + "\n")
+            log_f.flush()
         print("Row updated.")
 
-        # ---- Save after each row (atomic), to chosen output path ----
-        atomic_write_csv(df, out_path)
-        print(f"Saved CSV → {out_path}\n")
-
-    # Append change log at the end
-    if changes:
-        with open(args.log, "a", encoding="utf-8") as f:
-            for c in changes:
-                f.write(json.dumps(c) + "\n")
-        print(f"Appended change log → {args.log}")
-    else:
-        print("No edits were made; no change log entries created.")
+        dirty_count += 1
+        if dirty_count >= checkpoint_every:
+            _flush_dirty(df, dirty)
+            atomic_write_csv(df, out_path)
+            print(f"Checkpoint saved → {out_path}\n")
+            dirty_count = 0
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,26 @@
+"""Smoke tests for the auto-fix triage in removehallucinations.py."""
+from removehallucinations import RowView, anomalies_resolved, auto_fix
+
+
+def test_auto_fix_all_presence_flags_false():
+    # A fully-absent row (every presence flag False, no dependents set)
+    # must pass through untouched — this is the row shape that used to
+    # crash on the undeclared voiceover_type dependent.
+    view = RowView(video_id="1")
+    assert auto_fix(view) == {}
+
+
+def test_auto_fix_flip_does_not_resolve_overuse():
+    # A positive count flips its absent presence flag, but the count
+    # itself is untouched, so an overuse anomaly stays unresolved and
+    # the row must still reach a human.
+    view = RowView(video_id="2", b_roll_count=7)
+    changes = auto_fix(view)
+    assert view.b_roll_footage_present is True
+    assert changes["b_roll_footage_present"]["source"] == "auto"
+    assert not anomalies_resolved(view, "High edit counts (>5): b_roll_count=7")
+
+
+def test_resolved_when_counts_back_under_threshold():
+    view = RowView(video_id="3", b_roll_footage_present=True, b_roll_count=3)
+    assert anomalies_resolved(view, "High edit counts (>5): b_roll_count=7")
@@ -1,6 +1,11 @@
 import os
-import time
 import json
+import time
+import random
+import asyncio
+
+import httpx
+import orjson
 import pandas as pd
 from pathlib import Path
 from typing import List
@@ -8,7 +13,9 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from google import genai
 from enum import Enum
-from streamlit.testing.v1.element_tree import Caption
+import gemini_cache
+from prompts import TRANSCRIPT_PROMPT
+from storage import read_table, write_table
 
 # --------------------------
 # Env + config
@@ -23,8 +30,44 @@ if not GEMINI_API_KEY:
 FILTERED_CSV = Path("filtered") / f"{GENRE}_filtered.csv"
 KEEP_DIR = Path(f"kept_{GENRE}_videos")
 
-# Gemini client
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Gemini client — keep connections alive across the hundreds of
+# upload/poll/generate calls a run makes, instead of paying a TCP+TLS
+# handshake per request
+client = genai.Client(
+    api_key=GEMINI_API_KEY,
+    http_options={
+        "async_client_args": {
+            "limits": httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        },
+    },
+)
+
+# Upload and inference use disjoint resources, so they run as separate
+# pipeline stages: one uploader keeps up to UPLOAD_QUEUE_MAX processed
+# files queued while GENERATE_WORKERS coroutines run inference on them,
+# overlapping the two latencies across different videos
+UPLOAD_QUEUE_MAX = 8
+GENERATE_WORKERS = 4
+
+# File-processing poll: start fast, back off geometrically so long
+# videos don't hammer files.get, and give up after ten minutes
+POLL_BASE = 0.5
+POLL_FACTOR = 1.7
+POLL_CAP = 15.0
+POLL_TIMEOUT = 600.0
+
+# Transient API failures (rate limits, server errors) are retried with
+# full-jitter backoff; anything else (bad request, validation) is a
+# real failure and surfaces immediately
+RETRY_BASE = 2.0
+RETRY_CAP = 60.0
+MAX_ATTEMPTS = 5
+_TRANSIENT_MARKERS = ("429", "RESOURCE_EXHAUSTED", "500", "503", "UNAVAILABLE", "DEADLINE_EXCEEDED")
+
+
+def _is_transient(exc) -> bool:
+    msg = str(exc)
+    return any(marker in msg for marker in _TRANSIENT_MARKERS)
 
 
 # --------------------------
@@ -48,95 +91,275 @@ class VideoAnalysis(BaseModel):
 # --------------------------
 # Gemini analysis
 # --------------------------
-def gemini_analysis(video_path):
-    myfile = client.files.upload(file=video_path)
+_PROMPT_TAG = gemini_cache.prompt_tag(TRANSCRIPT_PROMPT)
 
-    # Wait for processing
+
+async def _upload_and_wait(video_path):
+    """Upload a video and wait until the Files API finishes processing."""
+    myfile = await client.aio.files.upload(file=video_path)
+
+    deadline = asyncio.get_running_loop().time() + POLL_TIMEOUT
+    delay = POLL_BASE
     while True:
-        current_file = client.files.get(name=myfile.name)
+        current_file = await client.aio.files.get(name=myfile.name)
         if current_file.state != "PROCESSING":
             break
+        if asyncio.get_running_loop().time() >= deadline:
+            raise TimeoutError(f"{video_path}: still PROCESSING after {POLL_TIMEOUT:.0f}s")
         print("Waiting for video to be processed...")
-        time.sleep(5)
+        # Jitter so concurrent polls don't fire in lockstep
+        await asyncio.sleep(delay + random.uniform(0, delay * 0.25))
+        delay = min(delay * POLL_FACTOR, POLL_CAP)
+
+    return myfile
 
+
+async def _get_upload(video_path, vhash):
+    """Reuse a still-live server-side upload if one exists, else upload."""
+    record = gemini_cache.load_upload_record(vhash)
+    if record and record.get("expiry", 0) > time.time() + 300:
+        try:
+            existing = await client.aio.files.get(name=record["name"])
+            if existing.state == "ACTIVE":
+                print(f"Reusing server-side upload for {video_path}")
+                return existing
+        except Exception:
+            pass
+        gemini_cache.drop_upload_record(vhash)
+
+    myfile = await _upload_and_wait(video_path)
+    # The Files API holds uploads for 48h; leave a little slack
+    gemini_cache.store_upload_record(vhash, myfile.name, time.time() + 47 * 3600)
+    return myfile
+
+
+async def gemini_analysis(myfile, cache_file, vhash):
+    """Run inference on an already-processed upload and cache the text."""
     print("Video processed, sending to Gemini...")
 
-    prompt = (
-        "You are a professional video analyser for blind and low vision editors."
-        "Your task is to create an audio video script that provides the following:"
-        "Different segments, each segments is a distinct shot or scene change. Small changes in motions or actions should not categorise as different segments."
-        "If their are multiple shot changes in a sentence, create segment based on a complete sentence rather than based on shot changes."
-        "If there are no shot or scene changes, or if the time interval between shot or scene is large, you can also create segments based on semantic differences in action or transcript."
-        "The segments should not be too long or too short."
-        "For each segment, provide the start and timestamp. Each timestamp should always be in seconds. Do not provide timestamp in milliseconds"
-        "For each segment, provide a visual description that allows a blind person with enough information to gauge what is going on in this segment. Ensure that the visual description is not too verbose to prevent information overload."
-        "Do not include information about video editing effects such as text overlays or on screen text, animated graphics, b-rolls, sounds effects, background music in the generated visual description or transcript."
-        "If the segment contains transcript, provide the transcript of that segment, do not provide transcript from music. The transcript should only include spoken audio in the video."
-        "For each segment, if the transcript is present, the transcript should be a complete sentence. "
-        "If the segment does not contain a transcript, provide an action and object based dense script of what is happening in this segment."
-    )
-
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[myfile, prompt],
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": VideoAnalysis,
-        },
-    )
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            response = await client.aio.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=[myfile, TRANSCRIPT_PROMPT],
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": VideoAnalysis,
+                },
+            )
+            break
+        except Exception as e:
+            if not _is_transient(e) or attempt == MAX_ATTEMPTS:
+                raise
+            delay = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** (attempt - 1)))
+            print(f"Transient Gemini error ({e}); retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
     print(response.text)
-    return response.text
+    # The SDK already validated the payload against VideoAnalysis —
+    # hand back its parse instead of decoding response.text again.
+    # This runs BEFORE anything is cached or deleted: a truncated
+    # response raises here, nothing poisons the cache, the upload
+    # record survives, and the video stays retryable next run.
+    gemini_data = response.parsed.model_dump(mode="json")
+    gemini_cache.store_cached(cache_file, response.text)
+    # The response is on disk now — free the server-side copy so quota
+    # isn't burned on files nothing will ask for again
+    try:
+        await client.aio.files.delete(name=myfile.name)
+    except Exception:
+        pass
+    gemini_cache.drop_upload_record(vhash)
+    return gemini_data
+
+
+# Rewriting the whole CSV after every video is O(N^2) I/O over a run.
+# Completed analyses are appended to a JSONL sidecar instead and merged
+# into the CSV once at the end; a crashed run's sidecar is replayed on
+# the next startup, so no finished work is ever lost.
+FSYNC_EVERY = 20
+
+
+def _sidecar_path(result_csv):
+    return f"{result_csv}.partial.jsonl"
+
+
+def _apply_update(df, idx, col_idx, video_id, gemini_data):
+    row = idx.get(video_id)
+    if row is None:
+        return
+    # Any new columns get added in one shot and remembered, so steady
+    # state is a plain dict lookup + positional write per field
+    missing = [k for k in gemini_data if k not in col_idx]
+    if missing:
+        df[missing] = pd.NA
+        col_idx.update({c: df.columns.get_loc(c) for c in missing})
+    for key, value in gemini_data.items():
+        df.iat[row, col_idx[key]] = value
+
+
+def _replay_sidecar(df, idx, col_idx, sidecar_path):
+    """Fold results left behind by a crashed run back into the frame."""
+    if not os.path.exists(sidecar_path):
+        return
+    replayed = 0
+    with open(sidecar_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = orjson.loads(line)
+            except Exception:
+                continue  # partial trailing line from a crash
+            _apply_update(df, idx, col_idx, record["video_id"], record["data"])
+            replayed += 1
+    if replayed:
+        print(f"Replayed {replayed} saved results from {sidecar_path}")
+
+
+async def _analyze_pending(df, idx, col_idx, pending, sidecar_path):
+    upload_q = asyncio.Queue(maxsize=UPLOAD_QUEUE_MAX)
+    out_q = asyncio.Queue()
+
+    async def uploader():
+        for file_path, video_id in pending:
+            # Hashing reads the whole video — push it to a thread so a
+            # multi-GB file can't stall every coroutine on the loop
+            vhash = await asyncio.to_thread(gemini_cache.video_hash, file_path)
+            cache_file = gemini_cache.cache_path_for(vhash, _PROMPT_TAG)
+            cached_text = await asyncio.to_thread(gemini_cache.load_cached, cache_file)
+            if cached_text is not None:
+                try:
+                    gemini_data = orjson.loads(cached_text)
+                except Exception as e:
+                    # Discard the entry and fall through to a fresh
+                    # upload — skipping here would wedge the video
+                    # behind the same bad bytes on every run
+                    print(f"Bad cache entry for {video_id}: {e}; discarding.")
+                    try:
+                        os.remove(cache_file)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    # Nothing to upload — hand the result downstream
+                    print(f"Cache hit for {file_path}")
+                    await out_q.put((video_id, gemini_data))
+                    continue
+            myfile = None
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    myfile = await _get_upload(file_path, vhash)
+                    break
+                except Exception as e:
+                    if not _is_transient(e) or attempt == MAX_ATTEMPTS:
+                        print(f"Upload failed for {video_id}: {e}")
+                        break
+                    delay = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** (attempt - 1)))
+                    print(f"Transient upload error for {video_id} ({e}); retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+            if myfile is None:
+                continue
+            await upload_q.put((video_id, cache_file, vhash, myfile))
+        for _ in range(GENERATE_WORKERS):
+            await upload_q.put(None)
+
+    async def worker():
+        while True:
+            item = await upload_q.get()
+            if item is None:
+                return
+            video_id, cache_file, vhash, myfile = item
+            print(f"Analyzing {video_id}...")
+            try:
+                gemini_data = await gemini_analysis(myfile, cache_file, vhash)
+            except Exception as e:
+                print(f"Analysis failed for {video_id}: {e}")
+                continue
+            await out_q.put((video_id, gemini_data))
+
+    async def consumer():
+        with open(sidecar_path, "a") as sidecar:
+            completed = 0
+            while True:
+                item = await out_q.get()
+                if item is None:
+                    return
+                video_id, gemini_data = item
+
+                # Convert lists to strings
+                for key, value in gemini_data.items():
+                    if isinstance(value, list):
+                        gemini_data[key] = ", ".join(map(str, value))
+
+                sidecar.write(json.dumps({"video_id": video_id, "data": gemini_data}) + "\n")
+                sidecar.flush()
+                completed += 1
+                if completed % FSYNC_EVERY == 0:
+                    os.fsync(sidecar.fileno())
+
+                _apply_update(df, idx, col_idx, video_id, gemini_data)
+                print(f"Updated analysis for video ID: {video_id}")
+
+    consumer_task = asyncio.ensure_future(consumer())
+    await asyncio.gather(uploader(), *(worker() for _ in range(GENERATE_WORKERS)))
+    await out_q.put(None)
+    await consumer_task
 
 
 def analyze_and_save(output_dir, result_csv):
     print("Analyzing videos with Gemini...")
-    df = pd.read_csv(result_csv)
+    # video_id parses straight to string — no post-read cast over a
+    # column of ints. The full width must still be loaded because the
+    # whole table is rewritten at the end; a usecols-narrowed read
+    # would silently drop every other column on save.
+    df = read_table(result_csv, dtype={"video_id": "string"})
 
-    for filename in os.listdir(output_dir):
-        if not filename.endswith(".mp4"):
-            continue
+    # The CSV read already delivers video_id as "string" dtype, so this
+    # is a no-op there; it only converts when a parquet store carries
+    # numeric ids. Either way no per-row Python str objects are built.
+    df["video_id"] = df["video_id"].astype("string")
+    idx = {v: i for i, v in enumerate(df["video_id"].to_numpy())}
+    col_idx = {c: i for i, c in enumerate(df.columns)}
+
+    sidecar_path = _sidecar_path(result_csv)
+    _replay_sidecar(df, idx, col_idx, sidecar_path)
+
+    # One vectorized pass marks everything already analyzed (including
+    # results just replayed), so the skip decision below is a set probe
+    if "segments" in df.columns:
+        done = set(df.loc[df["segments"].notna(), "video_id"])
+    else:
+        done = set()
 
-        video_id = filename.split("_")[-1].replace(".mp4", "")
+    # Single pass over the directory: scandir's DirEntry knows the file
+    # type without an extra stat, and the full worklist exists before
+    # any upload is dispatched
+    with os.scandir(output_dir) as it:
+        found = [(e.path, e.name.split("_")[-1][:-4])
+                 for e in it if e.is_file() and e.name.endswith(".mp4")]
 
+    pending = []
+    for file_path, video_id in found:
         # Skip if video ID not in CSV
-        if video_id not in df["video_id"].astype(str).values:
+        if video_id not in idx:
             print(f"Skipping {video_id}: not in CSV.")
             continue
 
         # Skip if already analyzed
-        if "segments" in df.columns and \
-           video_id in df["video_id"].astype(str).values and \
-           not pd.isna(df.loc[df["video_id"].astype(str) == video_id, "segments"].values[0]):
+        if video_id in done:
             print(f"Skipping {video_id}: already analyzed.")
             continue
 
+        pending.append((file_path, video_id))
 
-        print(f"Analyzing {video_id}...")
-        file_path = os.path.join(output_dir, filename)
-        raw_json = gemini_analysis(file_path)
-
-        try:
-            gemini_data = json.loads(raw_json)
-        except Exception as e:
-            print(f"Failed to parse Gemini output for {video_id}: {e}")
-            continue
-
-        # Convert lists to strings
-        for key, value in gemini_data.items():
-            if isinstance(value, list):
-                gemini_data[key] = ", ".join(map(str, value))
-
-        # Update row in CSV
-        if video_id in df["video_id"].astype(str).values:
-            for key, value in gemini_data.items():
-                df.loc[df["video_id"].astype(str) == video_id, key] = value
-            print(f"Updated analysis for video ID: {video_id}")
-            df.to_csv(result_csv, index=False)
-            print(f"Saved CSV after updating {video_id}")
-        else:
-            print(f"Video ID {video_id} not found in CSV. Skipping.")
-
-        time.sleep(10)  # optional delay
+    try:
+        asyncio.run(_analyze_pending(df, idx, col_idx, pending, sidecar_path))
+    finally:
+        # Whatever completed is merged back even if the run blew up;
+        # the sidecar only goes away after a fully clean save
+        write_table(df, result_csv)
+    if os.path.exists(sidecar_path):
+        os.remove(sidecar_path)
 
     print(f"Final CSV saved to {result_csv}")
 